@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.text import Truncator
 
-from api_board.models import Genre, Category, Title, User, Review, Comment
+from api_board.models import Genre, Category, Title, User, Review, Comment, OutgoingEmail
 
 
 @admin.register(Genre)
@@ -24,7 +24,7 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Title)
 class TitleAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'year', 'category')
+    list_display = ('id', 'name', 'year', 'category', 'rating')
     list_display_links = ('name',)
     ordering = ('id', 'name', 'year')
 
@@ -62,3 +62,11 @@ class CommentAdmin(admin.ModelAdmin):
     @staticmethod
     def title(obj):
         return obj.review.title.name
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'recipient', 'subject', 'created', 'attempts')
+    list_display_links = ('subject',)
+    list_filter = ('attempts', )
+    search_fields = ('recipient', )
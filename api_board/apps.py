@@ -1,5 +1,23 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+def restore_search_index(sender, using, **kwargs):
+    """Recreate triggers of full-text index, SQLite drops them when a migration rebuilds the title table."""
+    from api_board.search import FTS_TABLE, create_title_search_index
+
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        create_title_search_index(connection)
 
 
 class ApiBoardConfig(AppConfig):
     name = 'api_board'
+
+    def ready(self):
+        from api_board.metrics import instrument_connection
+
+        post_migrate.connect(restore_search_index, sender=self)
+        connection_created.connect(instrument_connection)
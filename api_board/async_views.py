@@ -0,0 +1,55 @@
+import time
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.urls import URLPattern
+from rest_framework.permissions import SAFE_METHODS
+
+from api_board.metrics import current_metrics
+
+# Read-heavy routes served by async views under ASGI
+ASYNC_ROUTES = ('title-list', 'title-detail', 'review-list', 'comment-list')
+
+
+def run_view(view, request, *args, **kwargs):
+    """Call view and render its response in the current thread, as the request handler does for sync views.
+
+    Database connections of the thread are closed by their age like at the end of request.
+    """
+    close_old_connections()
+    request_metrics = current_metrics.get()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            started = time.perf_counter()
+            response.render()
+            if request_metrics is not None:
+                request_metrics.render += time.perf_counter() - started
+        return response
+    finally:
+        close_old_connections()
+
+
+def offload(view):
+    """Return async view, which runs sync view in thread pool.
+
+    Safe requests of different clients run in parallel threads, while the event loop serves slow clients
+    without a thread per connection. Unsafe requests run in the single thread of sync code,
+    as the ASGI handler runs sync views.
+    """
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        thread_sensitive = request.method not in SAFE_METHODS
+        return await sync_to_async(partial(run_view, view, request, *args, **kwargs),
+                                   thread_sensitive=thread_sensitive)()
+    return async_view
+
+
+def offload_routes(urlpatterns, names=ASYNC_ROUTES):
+    """Return urlpatterns, where views of the route names are replaced by async views."""
+    return [
+        URLPattern(pattern.pattern, offload(pattern.callback), pattern.default_args, pattern.name)
+        if isinstance(pattern, URLPattern) and pattern.name in names else pattern
+        for pattern in urlpatterns
+    ]
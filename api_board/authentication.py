@@ -0,0 +1,78 @@
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# Claims, which are enough for permission checks
+USER_CLAIMS = ('username', 'role', 'is_superuser')
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token with username, role and superuser status of the user in claims.
+
+    Access token made from it gets the same claims.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class TokenClaimsUser(SimpleLazyObject):
+    """User of token, claims are read without database, the model is loaded on access of other attribute.
+
+    Once the model is loaded, claims are read from it, so changes of the user are seen by the request.
+    """
+
+    def __init__(self, token, load_user):
+        super().__init__(lambda: load_user(token))
+        self.__dict__['token'] = token
+
+    def _get_claim(self, claim):
+        if self._wrapped is empty:
+            return self.token[claim]
+        return getattr(self._wrapped, claim)
+
+    @property
+    def id(self):
+        return self.token[api_settings.USER_ID_CLAIM]
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def username(self):
+        return self._get_claim('username')
+
+    @property
+    def role(self):
+        return self._get_claim('role')
+
+    @property
+    def is_superuser(self):
+        return self._get_claim('is_superuser')
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWT authentication, which doesn't query user for tokens with claims of ClaimsRefreshToken.
+
+    Changes of role, username or activity of user are applied only to tokens issued after them.
+    Tokens without claims are authenticated as by JWTAuthentication.
+    """
+
+    def get_user(self, validated_token):
+        if not all(claim in validated_token for claim in (api_settings.USER_ID_CLAIM, *USER_CLAIMS)):
+            return super().get_user(validated_token)
+        return TokenClaimsUser(validated_token, super().get_user)
@@ -0,0 +1,76 @@
+import csv
+import json
+from tempfile import SpooledTemporaryFile
+
+from api_board.models import Title
+
+CSV_COLUMNS = ['id', 'name', 'year', 'description', 'rating', 'category', 'genre']
+# Exports up to this size in bytes stay in memory, larger ones are moved to a temporary file on disk
+SPOOL_MAX_SIZE = 10 * 1024 * 1024
+
+
+def iter_titles(chunk_size=1000):
+    """Yield all titles with category and genres, loading them by chunks in order of id.
+
+    Every chunk is a keyset query with its own prefetch of genres, so memory depends only on chunk size.
+    """
+    queryset = Title.objects.select_related('category').prefetch_related('genre').order_by('id')
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last_id = chunk[-1].id
+
+
+def title_record(title):
+    return {
+        'id': title.id,
+        'name': title.name,
+        'year': title.year,
+        'description': title.description,
+        'rating': None if title.rating is None else str(title.rating),
+        'category': title.category.slug,
+        'genre': [genre.slug for genre in title.genre.all()],
+    }
+
+
+class Echo:
+    """Object with write method, which returns the written value instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def render_ndjson(titles):
+    for title in titles:
+        yield json.dumps(title_record(title), ensure_ascii=False) + '\n'
+
+
+def render_csv(titles):
+    writer = csv.DictWriter(Echo(), fieldnames=CSV_COLUMNS)
+    yield writer.writeheader()
+    for title in titles:
+        record = title_record(title)
+        record['genre'] = ','.join(record['genre'])
+        yield writer.writerow(record)
+
+
+RENDERERS = {
+    'ndjson': (render_ndjson, 'application/x-ndjson'),
+    'csv': (render_csv, 'text/csv'),
+}
+
+
+def export_titles(output, chunk_size=1000):
+    """Render all titles as output format into a temporary binary file, return it rewound to the start.
+
+    All queries run in the calling thread, so the response can be sent from an event loop.
+    """
+    render, _ = RENDERERS[output]
+    file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    for line in render(iter_titles(chunk_size)):
+        file.write(line.encode())
+    file.seek(0)
+    return file
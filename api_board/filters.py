@@ -1,6 +1,7 @@
 from django_filters import rest_framework as filters
 
 from api_board.models import Title
+from api_board.search import search_titles
 
 
 class TitleFilter(filters.FilterSet):
@@ -8,7 +9,12 @@ class TitleFilter(filters.FilterSet):
     name = filters.CharFilter(field_name='name', lookup_expr='icontains')  # noqa
     genre = filters.CharFilter(field_name='genre__slug', label='genre')
     category = filters.CharFilter(field_name='category__slug')
+    q = filters.CharFilter(method='full_text_search', label='Full-text search by name and description')
 
     class Meta:
         model = Title
         fields = ['year']
+
+    def full_text_search(self, queryset, name, value):
+        """Filter by words in name and description, ordered by relevance."""
+        return search_titles(queryset, value)
@@ -1,7 +1,67 @@
-from random import randint
+import re
 
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, DecimalField, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Sum, \
+    Value
+from django.db.models.functions import Cast, Coalesce, Length, NullIf
+from django.utils import timezone
 from django.utils.text import slugify
 
+from api_board.models import Title, Review, Comment
+
+# The greatest character, values starting with a prefix are less than prefix + MAX_CHAR
+MAX_CHAR = chr(0x10FFFF)
+
+
+def next_free_value(obj, field, base, separator=''):
+    """Return base if it's free, otherwise base with the number following the greatest taken one.
+
+    Taken values are looked up in one query by an indexed range of the prefix, among values of form
+    base, separator and number the longest and then the greatest one has the greatest number.
+    Numbers with leading zeros, e.g. john007, aren't generated and aren't compared with generated ones.
+    Base is shortened, if the value with number doesn't fit max_length of the field.
+
+    :param obj: Model
+    :param field: Name of unique field
+    :param base: Value without number
+    :param separator: Str between base and number
+    :rtype: str
+    """
+    pattern = r'^%s(%s[1-9][0-9]*)?$' % (re.escape(base), re.escape(separator))
+    last = (obj.objects
+            .filter(**{field + '__gte': base, field + '__lt': base + MAX_CHAR, field + '__regex': pattern})
+            .order_by(Length(field).desc(), '-' + field)
+            .values_list(field, flat=True)
+            .first())
+    if last is None:
+        return base
+
+    value = '%s%s%d' % (base, separator, int(last[len(base) + len(separator):] or 0) + 1)
+    excess = len(value) - obj._meta.get_field(field).max_length
+    if excess > 0:
+        return next_free_value(obj, field, base[:-excess], separator)
+    return value
+
+
+def create_unique(obj, field, generate, create, attempts=5):
+    """Create object by create(value) with value of generate(), the value is generated again if
+    a concurrent request took it before the insert.
+
+    :param obj: Model
+    :param field: Name of unique field
+    :param generate: Function returning a free value
+    :param create: Function creating object with the value
+    :param attempts: Number of inserts before IntegrityError is raised
+    """
+    for attempt in range(attempts):
+        value = generate()
+        try:
+            with transaction.atomic():
+                return create(value)
+        except IntegrityError:
+            if attempt == attempts - 1 or not obj.objects.filter(**{field: value}).exists():
+                raise
+
 
 def generate_username(obj, email):
     """Return unique username.
@@ -11,12 +71,10 @@ def generate_username(obj, email):
     :param email: Email,which the user specified during registration
     :type email:str
     :rtype: str
-    :return: Unique username.
+    :return: Unique username, local part of email with a number if it's taken.
     """
-    username = email.split('@')[0]
-    while obj.objects.filter(username=username).exists():
-        username += str(randint(0, 9))
-    return username
+    username = re.sub(r'[^\w.@+-]', '', email.split('@')[0]) or 'user'
+    return next_free_value(obj, 'username', username)
 
 
 def generate_slug(slug, name, obj):
@@ -26,12 +84,62 @@ def generate_slug(slug, name, obj):
     :param name: Name of category of genre
     :param obj: Category or genre object
 
-    :return: Unique slug
+    :return: Unique slug, with a number after hyphen if it's taken.
     """
     if slug is None:
         slug = slugify(name)
     else:
         slug = slugify(slug)
-    while obj.objects.filter(slug=slug):
-        slug += str(randint(0, 10))
-    return slug
+    return next_free_value(obj, 'slug', slug, separator='-')
+
+
+def update_title_rating(title_id, score_delta, count_delta):
+    """Apply a change of reviews to the stored rating of title in one UPDATE.
+
+    The new sum, count and average are computed by the database from the current row,
+    so concurrent review writes for the same title don't overwrite each other.
+
+    :param title_id: Id of title
+    :param score_delta: Difference of the sum of scores
+    :param count_delta: Difference of the number of reviews
+    """
+    score_sum = F('score_sum') + score_delta
+    reviews_count = F('reviews_count') + count_delta
+    rating = ExpressionWrapper(Cast(score_sum, FloatField()) / NullIf(reviews_count, Value(0)),
+                               output_field=DecimalField())
+    Title.objects.filter(id=title_id).update(score_sum=score_sum,
+                                             reviews_count=reviews_count,
+                                             rating=rating,
+                                             modified=timezone.now())
+
+
+def rebuild_title_ratings():
+    """Recalculate stored rating of every title from reviews, return number of titles.
+
+    Runs as a single UPDATE with correlated subqueries, so the titles are never loaded into memory.
+    """
+    reviews = Review.objects.filter(title=OuterRef('pk')).order_by().values('title')
+    return Title.objects.update(
+        score_sum=Coalesce(Subquery(reviews.annotate(value=Sum('score')).values('value')), 0),
+        reviews_count=Coalesce(Subquery(reviews.annotate(value=Count('id')).values('value')), 0),
+        rating=Subquery(reviews.annotate(value=Avg('score')).values('value')),
+        modified=timezone.now(),
+    )
+
+
+def update_review_comments_count(review_id, delta):
+    """Apply a change of the number of comments to the stored counter of review in one UPDATE.
+
+    :param review_id: Id of review
+    :param delta: Difference of the number of comments
+    """
+    Review.objects.filter(id=review_id).update(comments_count=F('comments_count') + delta,
+                                               modified=timezone.now())
+
+
+def rebuild_review_comments_counts():
+    """Recalculate stored number of comments of every review by a single UPDATE, return number of reviews."""
+    comments = Comment.objects.filter(review=OuterRef('pk')).order_by().values('review')
+    return Review.objects.update(
+        comments_count=Coalesce(Subquery(comments.annotate(value=Count('id')).values('value')), 0),
+    )
@@ -0,0 +1,186 @@
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, IntegerField, Min, Q, Subquery, Sum, \
+    Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from api_board.models import Category, Genre, LeaderboardEntry, Review, Title
+from api_board.stats import ANY
+
+METRICS = ('rating', 'velocity')
+# Days of sliding windows, 0 is all time
+WINDOWS = (0, 7, 30)
+# Greatest number of titles served by a board
+TOP_K = 100
+# Titles stored per board. A title below the stored ones is missed from the served top
+# only if more than TOP_K stored titles fall below it before the next refresh.
+CAPACITY = 2 * TOP_K
+RANKING = ('-value', '-reviews_count', 'title_id')
+
+
+def board_filter(boards):
+    return reduce(or_, (Q(category_id=category_id, genre_id=genre_id) for category_id, genre_id in boards))
+
+
+def window_start(window):
+    return timezone.now() - timedelta(days=window)
+
+
+def make_entries(reviews, score):
+    """Return values (value, rating, reviews_count) per metric of title with reviews and sum of scores."""
+    if not reviews:
+        return {}
+    rating = score / reviews
+    return {'rating': (rating, rating, reviews), 'velocity': (reviews, rating, reviews)}
+
+
+def ranked_values(title_id, title_reviews, title_score):
+    """Return values (value, rating, reviews_count) of title per (metric, window), where it has reviews.
+
+    Reviews of sliding windows are counted by one query of the index of reviews of title by date.
+    """
+    aggregates = {}
+    for window in WINDOWS:
+        if window:
+            recent = Q(pub_date__gte=window_start(window))
+            aggregates['reviews_%d' % window] = Count('id', filter=recent)
+            aggregates['score_%d' % window] = Sum('score', filter=recent)
+    sums = Review.objects.filter(title_id=title_id).aggregate(**aggregates)
+
+    values = {}
+    for window in WINDOWS:
+        if window:
+            reviews, score = sums['reviews_%d' % window], sums['score_%d' % window]
+        else:
+            reviews, score = title_reviews, title_score
+        for metric, entry in make_entries(reviews, score).items():
+            values[metric, window] = entry
+    return values
+
+
+def update_title_entries(title_id):
+    """Put the current rating and number of reviews of title to leaderboards of its category and genres.
+
+    Stored entries of the title get new values by one UPDATE, entries of other boards are removed,
+    e.g. after change of category. The title enters boards, which aren't full or where it isn't below
+    the lowest entry, and the last entry by RANKING leaves a board over CAPACITY.
+    """
+    rows = Title.objects.filter(id=title_id).values_list('category_id', 'reviews_count', 'score_sum', 'genre')
+    if not rows:
+        return
+    category_id, reviews, score, _ = rows[0]
+    boards = [(ANY, ANY), (category_id, ANY), *((ANY, genre_id) for *_, genre_id in rows if genre_id is not None)]
+    values = ranked_values(title_id, reviews, score)
+
+    stored = LeaderboardEntry.objects.filter(title_id=title_id)
+    if not values:
+        stored.delete()
+        return
+    ranked = reduce(or_, (Q(metric=metric, window=window) for metric, window in values))
+    stored.exclude(ranked & board_filter(boards)).delete()
+
+    def by_board(index, output_field):
+        return Case(*(When(metric=metric, window=window, then=Value(entry[index]))
+                      for (metric, window), entry in values.items()), output_field=output_field)
+    stored.update(value=by_board(0, FloatField()), rating=by_board(1, FloatField()),
+                  reviews_count=by_board(2, IntegerField()))
+
+    board_sizes = {
+        (row['metric'], row['window'], row['category_id'], row['genre_id']): row
+        for row in (LeaderboardEntry.objects.filter(board_filter(boards)).order_by()
+                    .values('metric', 'window', 'category_id', 'genre_id')
+                    .annotate(size=Count('id'), lowest=Min('value'), member=Count('id', filter=Q(title_id=title_id))))
+    }
+    new, full = [], []
+    for (metric, window), (value, rating, reviews) in values.items():
+        for board_category_id, board_genre_id in boards:
+            key = (metric, window, board_category_id, board_genre_id)
+            board = board_sizes.get(key)
+            if board is not None and (board['member'] or board['size'] >= CAPACITY and value < board['lowest']):
+                continue
+            new.append(LeaderboardEntry(metric=metric, window=window, category_id=board_category_id,
+                                        genre_id=board_genre_id, title_id=title_id, value=value,
+                                        rating=rating, reviews_count=reviews))
+            if board is not None and board['size'] >= CAPACITY:
+                full.append(key)
+    LeaderboardEntry.objects.bulk_create(new, ignore_conflicts=True)
+
+    for metric, window, board_category_id, board_genre_id in full:
+        board = LeaderboardEntry.objects.filter(metric=metric, window=window,
+                                                category_id=board_category_id, genre_id=board_genre_id)
+        board.filter(id__in=board.order_by(*RANKING).values('id')[CAPACITY:]).delete()
+
+
+def board_titles(window, category_id, genre_id):
+    """Return queryset of values title_ref, window_reviews and window_score of titles with reviews in window."""
+    if window:
+        queryset, prefix = Review.objects.filter(pub_date__gte=window_start(window)), 'title__'
+    else:
+        queryset, prefix = Title.objects.filter(reviews_count__gt=0), ''
+    if category_id:
+        queryset = queryset.filter(**{prefix + 'category_id': category_id})
+    if genre_id:
+        queryset = queryset.filter(**{prefix + 'genre': genre_id})
+
+    if window:
+        return (queryset.values(title_ref=F('title_id'))
+                .annotate(window_reviews=Count('id'), window_score=Sum('score')))
+    return queryset.values(title_ref=F('id'), window_reviews=F('reviews_count'), window_score=F('score_sum'))
+
+
+def refresh_board(metric, window, category_id, genre_id):
+    """Replace entries of board by the top CAPACITY titles computed from reviews, return number of entries.
+
+    Entries are replaced in a transaction of the board only, so the write lock isn't held between boards.
+    """
+    queryset = board_titles(window, category_id, genre_id)
+    if metric == 'rating':
+        value = ExpressionWrapper(Cast('window_score', FloatField()) / F('window_reviews'),
+                                  output_field=FloatField())
+    else:
+        value = F('window_reviews')
+    top = queryset.annotate(value=value).order_by('-value', '-window_reviews', 'title_ref')[:CAPACITY]
+
+    entries = []
+    for row in top:
+        value, rating, reviews = make_entries(row['window_reviews'], row['window_score'])[metric]
+        entries.append(LeaderboardEntry(metric=metric, window=window, category_id=category_id, genre_id=genre_id,
+                                        title_id=row['title_ref'], value=value, rating=rating,
+                                        reviews_count=reviews))
+    with transaction.atomic():
+        LeaderboardEntry.objects.filter(metric=metric, window=window, category_id=category_id,
+                                        genre_id=genre_id).delete()
+        LeaderboardEntry.objects.bulk_create(entries)
+    return len(entries)
+
+
+def refresh_leaderboards(windows=WINDOWS):
+    """Recompute boards of all metrics, categories and genres for windows, return number of boards.
+
+    Sliding windows are moved by the refresh only, since their titles change with time without writes.
+    Every board is replaced in its own transaction, readers see each board either old or new.
+    """
+    boards = [(ANY, ANY),
+              *((category_id, ANY) for category_id in Category.objects.values_list('id', flat=True)),
+              *((ANY, genre_id) for genre_id in Genre.objects.values_list('id', flat=True))]
+    LeaderboardEntry.objects.filter(window__in=windows).exclude(board_filter(boards)).delete()
+    for window in windows:
+        for metric in METRICS:
+            for category_id, genre_id in boards:
+                refresh_board(metric, window, category_id, genre_id)
+    return len(boards) * len(METRICS) * len(windows)
+
+
+def get_leaderboard(metric='rating', window=0, category=None, genre=None, limit=10):
+    """Return queryset of top entries of board of category slug or genre slug, read by index of board."""
+    lookups = {'category_id': ANY, 'genre_id': ANY}
+    if category:
+        lookups['category_id'] = Subquery(Category.objects.filter(slug=category).values('id'))
+    if genre:
+        lookups['genre_id'] = Subquery(Genre.objects.filter(slug=genre).values('id'))
+    return (LeaderboardEntry.objects.filter(metric=metric, window=window, **lookups)
+            .select_related('title').order_by(*RANKING)[:limit])
@@ -0,0 +1,153 @@
+import json
+import math
+import platform
+import random
+import subprocess
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.reverse import reverse
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from api_board.models import Category, Genre, Title, Review, Comment
+
+
+class QueryCounter:
+    """Database execute wrapper counting queries."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, percent):
+    """Return percentile of sorted values by nearest rank."""
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Request the main endpoints in process by APIClient and report p50/p99 latency, '
+            'queries per request and throughput. Run it on data of generate_data, '
+            'results are written to JSON file to compare commits.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Number of measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=20, help='Number of requests before measured ones')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of ids of requested objects')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Benchmark only this endpoint, can be repeated')
+        parser.add_argument('--output', type=Path, default=Path('benchmark.json'))
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('At least one request is required')
+        self.random = random.Random(options['seed'])
+        title_ids = list(Title.objects.order_by('id').values_list('id', flat=True)[:10000])
+        reviews = list(Review.objects.order_by('id').values_list('title_id', 'id')[:10000])
+        comments = list(Comment.objects.order_by('id').values_list('review__title_id', 'review_id', 'id')[:10000])
+        if not (title_ids and reviews and comments):
+            raise CommandError('Titles, reviews and comments are required, see generate_data command')
+        genre = Genre.objects.values_list('slug', flat=True).first()
+        pages = min(10, math.ceil(len(title_ids) / api_settings.PAGE_SIZE))
+
+        endpoints = {
+            'title-list': lambda: (reverse('title-list'), {'page': self.random.randint(1, pages)}),
+            'title-list-cursor': lambda: (reverse('title-list'), {'pagination': 'cursor'}),
+            'title-list-genre': lambda: (reverse('title-list'), {'genre': genre}),
+            'title-list-search': lambda: (reverse('title-list'), {'q': 'home'}),
+            'title-detail': lambda: (reverse('title-detail', kwargs={'pk': self.random.choice(title_ids)}), {}),
+            'review-list': lambda: (reverse('review-list', kwargs={'title_id': self.random.choice(reviews)[0]}),
+                                    {}),
+            'review-detail': lambda: self.review_detail(reviews),
+            'comment-list': lambda: self.comment_list(comments),
+            'comment-detail': lambda: self.comment_detail(comments),
+            'category-list': lambda: (reverse('category-list'), {}),
+            'genre-list': lambda: (reverse('genre-list'), {}),
+        }
+        selected = options['endpoints'] or list(endpoints)
+        unknown = set(selected) - set(endpoints)
+        if unknown:
+            raise CommandError('Unknown endpoints: %s, choose from %s' % (', '.join(unknown), ', '.join(endpoints)))
+
+        results = {}
+        # APIClient requests the 'testserver' host
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            client = APIClient()
+            for name in selected:
+                results[name] = self.measure(client, endpoints[name], options['warmup'], options['requests'])
+                self.stdout.write('%-18s p50 %7.2f ms  p99 %7.2f ms  %5.1f queries  %7.1f req/s' % (
+                    name, results[name]['p50_ms'], results[name]['p99_ms'], results[name]['queries'],
+                    results[name]['throughput']))
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connections['default'].vendor,
+            'dataset': {model._meta.model_name: model.objects.count()
+                        for model in (Category, Genre, Title, Review, Comment)},
+            'options': {'requests': options['requests'], 'warmup': options['warmup'], 'seed': options['seed']},
+            'results': results,
+        }
+        options['output'].write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS('Results written to %s' % options['output']))
+
+    def review_detail(self, reviews):
+        title_id, review_id = self.random.choice(reviews)
+        return reverse('review-detail', kwargs={'title_id': title_id, 'pk': review_id}), {}
+
+    def comment_list(self, comments):
+        title_id, review_id, _ = self.random.choice(comments)
+        return reverse('comment-list', kwargs={'title_id': title_id, 'review_id': review_id}), {}
+
+    def comment_detail(self, comments):
+        title_id, review_id, comment_id = self.random.choice(comments)
+        return reverse('comment-detail', kwargs={'title_id': title_id, 'review_id': review_id, 'pk': comment_id}), {}
+
+    def measure(self, client, make_request, warmup, requests):
+        for _ in range(warmup):
+            client.get(*make_request())
+
+        counter = QueryCounter()
+        timings = []
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            started = time.perf_counter()
+            for _ in range(requests):
+                path, params = make_request()
+                request_started = time.perf_counter()
+                response = client.get(path, params)
+                timings.append(time.perf_counter() - request_started)
+                if response.status_code != 200:
+                    raise CommandError('%s returned %d' % (path, response.status_code))
+            elapsed = time.perf_counter() - started
+
+        timings.sort()
+        return {
+            'requests': requests,
+            'p50_ms': round(percentile(timings, 50) * 1000, 3),
+            'p99_ms': round(percentile(timings, 99) * 1000, 3),
+            'mean_ms': round(sum(timings) / requests * 1000, 3),
+            'queries': round(counter.count / requests, 2),
+            'throughput': round(requests / elapsed, 1),
+        }
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api_board.models import Title, Review, Comment
+from api_board.serializers import TitleSerializerGet, ReviewSerializer, CommentSerializer, ValuesSerializer
+
+CASES = {
+    'titles': (Title.objects.select_related('category').prefetch_related('genre').order_by('id'),
+               TitleSerializerGet),
+    'reviews': (Review.objects.select_related('author', 'title').order_by('pub_date', 'id'), ReviewSerializer),
+    'comments': (Comment.objects.select_related('author').order_by('pub_date', 'id'), CommentSerializer),
+}
+
+
+class Command(BaseCommand):
+    help = ('Compare cost per row of list serialization by model serializer and by ValuesSerializer '
+            'on the rows of the current database. Time includes queries.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Number of rows of each model')
+        parser.add_argument('--repeat', type=int, default=5, help='The best of this number of runs is reported')
+
+    def handle(self, *args, **options):
+        for name, (queryset, serializer_class) in CASES.items():
+            queryset = queryset[:options['rows']]
+            fast_serializer = ValuesSerializer(serializer_class)
+            rows = len(queryset)
+            if not rows:
+                self.stdout.write('%s: no rows' % name)
+                continue
+
+            before = self.measure(lambda: serializer_class(queryset.all(), many=True).data, options['repeat'])
+            after = self.measure(lambda: fast_serializer.serialize(fast_serializer.values(queryset.all())),
+                                 options['repeat'])
+            if serializer_class(queryset.all(), many=True).data != fast_serializer.serialize(
+                    fast_serializer.values(queryset.all())):
+                raise CommandError('Output of ValuesSerializer differs for %s' % name)
+            self.stdout.write('%s: %d rows, %.1f us/row before, %.1f us/row after, %.1fx' % (
+                name, rows, before / rows * 1e6, after / rows * 1e6, before / after))
+
+    @staticmethod
+    def measure(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api_board import similar
+from api_board.similar import NEIGHBORS, SHRINKAGE, TITLES_CHUNK_SIZE, build_similar_titles
+
+
+class Command(BaseCommand):
+    help = ('Build index of similar titles by scores of common reviewers, which /titles/{id}/similar/ serves. '
+            'It is computed by NumPy and SciPy by chunks of titles, if they are installed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbors', type=int, default=NEIGHBORS, help='Similar titles stored per title')
+        parser.add_argument('--shrinkage', type=float, default=SHRINKAGE,
+                            help='Number of common reviewers, at which similarity is shrunk by half')
+        parser.add_argument('--chunk-size', type=int, default=TITLES_CHUNK_SIZE,
+                            help='Titles per matrix product, memory of the build grows with it')
+        parser.add_argument('--pure-python', action='store_true', help="Don't use NumPy and SciPy")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['neighbors'] < 1:
+            raise CommandError('--chunk-size and --neighbors must be positive')
+        vectorized = not options['pure_python'] and similar.np is not None
+        if not vectorized and not options['pure_python']:
+            self.stdout.write('NumPy and SciPy are not installed, index is built in pure Python')
+
+        started = time.monotonic()
+        count = build_similar_titles(neighbors=options['neighbors'], shrinkage=options['shrinkage'],
+                                     chunk_size=options['chunk_size'], vectorized=vectorized)
+        self.stdout.write(self.style.SUCCESS('Similar titles found for %d titles in %.1f s'
+                                             % (count, time.monotonic() - started)))
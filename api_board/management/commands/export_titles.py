@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api_board.export import RENDERERS, iter_titles
+
+
+class Command(BaseCommand):
+    help = 'Export all titles with rating, genres and category as NDJSON or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(RENDERERS), default='ndjson')
+        parser.add_argument('--output', help='Path of file, by default titles are written to stdout')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        render, _ = RENDERERS[options['format']]
+        lines = render(iter_titles(options['chunk_size']))
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as file:
+            file.writelines(lines)
@@ -0,0 +1,124 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api_board.functions import rebuild_review_comments_counts, rebuild_title_ratings
+from api_board.leaderboards import refresh_leaderboards
+from api_board.management.commands.import_data import keep_auto_now_add
+from api_board.models import Category, Genre, Title, Review, Comment
+from api_board.stats import rebuild_title_stats
+
+User = get_user_model()
+
+# Publication dates are spread over 3 years before this date
+LAST_DATE = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+WORDS = ('home', 'alone', 'war', 'peace', 'night', 'city', 'lost', 'star', 'river', 'king', 'garden', 'winter',
+         'summer', 'ghost', 'machine', 'song', 'island', 'road', 'fire', 'dream')
+
+
+class Command(BaseCommand):
+    help = ('Add synthetic categories, genres, users, titles, reviews and comments for benchmarks, '
+            'e.g. --titles 100000 --reviews 5000000 --comments 10000000. Data depends only on sizes and --seed, '
+            'so databases generated with the same options are comparable. It runs only on a database without '
+            'categories, genres, titles, reviews and comments, e.g. a new one after migrate.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=1000)
+        parser.add_argument('--reviews', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=None,
+                            help='By default enough users for the reviews, since a user reviews a title once')
+        parser.add_argument('--categories', type=int, default=5)
+        parser.add_argument('--genres', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['titles'] < 1:
+            raise CommandError('At least one title is required')
+        users = options['users'] or max(100, -(-options['reviews'] // options['titles']))
+        if options['reviews'] > options['titles'] * users:
+            raise CommandError('A user reviews a title once, use more users or titles')
+        if options['comments'] and not options['reviews']:
+            raise CommandError('Comments require reviews')
+        for model in (Category, Genre, Title, Review, Comment):
+            if model.objects.exists():
+                raise CommandError('The database already has %s, use a new database for generated data'
+                                   % model._meta.verbose_name_plural)
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.started = time.monotonic()
+
+        prefix = 'bench%d' % options['seed']
+        category_ids = self.create(Category, options['categories'], lambda i, pk: Category(
+            id=pk, name='%s category %d' % (prefix, i), slug='%s-category-%d' % (prefix, i),
+        ))
+        genre_ids = self.create(Genre, options['genres'], lambda i, pk: Genre(
+            id=pk, name='%s genre %d' % (prefix, i), slug='%s-genre-%d' % (prefix, i),
+        ))
+        password = make_password(None)
+        user_ids = self.create(User, users, lambda i, pk: User(
+            id=pk, username='%s_user_%d' % (prefix, i), email='%s_user_%d@example.com' % (prefix, i),
+            password=password,
+        ))
+        title_ids = self.create(Title, options['titles'], lambda i, pk: Title(
+            id=pk,
+            name=self.text(2, 4).capitalize(),
+            year=self.random.randint(1900, 2021),
+            description=self.text(10, 30),
+            category_id=self.random.choice(category_ids),
+        ))
+        self.create(Title.genre.through, options['titles'], lambda i, pk: Title.genre.through(
+            title_id=title_ids[i], genre_id=self.random.choice(genre_ids),
+        ))
+        # Review i is written by user i // titles, so pairs of author and title are unique
+        review_ids = self.create(Review, options['reviews'], lambda i, pk: Review(
+            id=pk,
+            title_id=title_ids[i % len(title_ids)],
+            author_id=user_ids[i // len(title_ids)],
+            text=self.text(5, 50),
+            score=self.random.randint(1, 10),
+            pub_date=self.date(),
+        ))
+        self.create(Comment, options['comments'], lambda i, pk: Comment(
+            id=pk,
+            review_id=self.random.choice(review_ids),
+            author_id=self.random.choice(user_ids),
+            text=self.text(3, 30),
+            pub_date=self.date(),
+        ))
+
+        with transaction.atomic():
+            rebuild_title_ratings()
+            rebuild_review_comments_counts()
+            rebuild_title_stats()
+        refresh_leaderboards()
+        self.stdout.write(self.style.SUCCESS('Data generated in %.1f s' % (time.monotonic() - self.started)))
+
+    def text(self, min_words, max_words):
+        return ' '.join(self.random.choices(WORDS, k=self.random.randint(min_words, max_words)))
+
+    def date(self):
+        return LAST_DATE - timedelta(seconds=self.random.randrange(3 * 365 * 24 * 3600))
+
+    def create(self, model, count, build):
+        """Bulk create count objects by batches with ids following the current maximum, return the ids."""
+        first_id = (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+        ids = range(first_id, first_id + count)
+        with keep_auto_now_add(model):
+            for start in range(0, count, self.batch_size):
+                batch = [build(i, ids[i]) for i in range(start, min(start + self.batch_size, count))]
+                with transaction.atomic():
+                    model.objects.bulk_create(batch)
+                self.stdout.write('%s: %d of %d rows, %.1f s' % (model._meta.verbose_name_plural,
+                                                                 start + len(batch), count,
+                                                                 time.monotonic() - self.started))
+        return ids
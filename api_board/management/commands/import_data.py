@@ -0,0 +1,176 @@
+import csv
+import json
+import time
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from api_board.functions import rebuild_review_comments_counts, rebuild_title_ratings
+from api_board.leaderboards import refresh_leaderboards
+from api_board.models import Category, Genre, Title, Review, Comment
+from api_board.stats import rebuild_title_stats
+
+User = get_user_model()
+
+
+def read_csv(file):
+    yield from csv.DictReader(file)
+
+
+def read_jsonl(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+@contextmanager
+def keep_auto_now_add(model):
+    """Save dates from the file to auto_now_add fields instead of the current time."""
+    fields = [field for field in model._meta.concrete_fields if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = ('Import rows of one kind from CSV or JSONL file by batches of bulk inserts. '
+            'Columns: categories and genres - name, slug; titles - id, name, year, description, category (slug); '
+            'genre_titles - title (id), genre (slug); users - username, email, role, bio, first_name, last_name; '
+            'reviews - id, title (id), author (username), text, score, pub_date; '
+            'comments - id, review (id), author (username), text, pub_date. '
+            'Import kinds in this order, ids are optional.')
+
+    kinds = {
+        'categories': (Category, 'build_category'),
+        'genres': (Genre, 'build_genre'),
+        'titles': (Title, 'build_title'),
+        'genre_titles': (Title.genre.through, 'build_genre_title'),
+        'users': (User, 'build_user'),
+        'reviews': (Review, 'build_review'),
+        'comments': (Comment, 'build_comment'),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(self.kinds))
+        parser.add_argument('path', type=Path)
+        parser.add_argument('--format', choices=list(READERS),
+                            help='Format of file, by default it is taken from extension')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--ignore-conflicts', action='store_true',
+                            help='Skip rows, which violate unique constraints, e.g. to resume import')
+
+    def handle(self, *args, **options):
+        kind, path = options['kind'], options['path']
+        file_format = options['format'] or path.suffix.lstrip('.')
+        if file_format not in READERS:
+            raise CommandError('Unknown format of %s, use --format' % path)
+        model, builder_name = self.kinds[kind]
+        build = getattr(self, builder_name)
+
+        started = time.monotonic()
+        total = 0
+        with open(path, newline='', encoding='utf-8') as file, keep_auto_now_add(model):
+            rows = READERS[file_format](file)
+            while True:
+                batch = []
+                for row in islice(rows, options['batch_size']):
+                    try:
+                        batch.append(build(row))
+                    except KeyError as error:
+                        raise CommandError('Row %d: missing column or unknown value %s' % (total + len(batch) + 1,
+                                                                                          error))
+                if not batch:
+                    break
+                with transaction.atomic():
+                    model.objects.bulk_create(batch,
+                                              batch_size=options['batch_size'],
+                                              ignore_conflicts=options['ignore_conflicts'])
+                total += len(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write('%s: %d rows, %d rows/s' % (kind, total, total / elapsed if elapsed else total))
+
+        if kind == 'reviews':
+            rebuild_title_ratings()
+            self.stdout.write('Rating of titles rebuilt')
+        if kind == 'comments':
+            rebuild_review_comments_counts()
+            self.stdout.write('Comments of reviews counted')
+        if kind in ('titles', 'genre_titles', 'reviews'):
+            with transaction.atomic():
+                rebuild_title_stats()
+            refresh_leaderboards()
+            self.stdout.write('Stats and leaderboards of titles rebuilt')
+        self.stdout.write(self.style.SUCCESS('Imported %d %s in %.1f s' % (total, kind, time.monotonic() - started)))
+
+    @cached_property
+    def category_ids(self):
+        return dict(Category.objects.values_list('slug', 'id'))
+
+    @cached_property
+    def genre_ids(self):
+        return dict(Genre.objects.values_list('slug', 'id'))
+
+    @cached_property
+    def user_ids(self):
+        return dict(User.objects.values_list('username', 'id'))
+
+    @cached_property
+    def unusable_password(self):
+        return make_password(None)
+
+    def build_category(self, row):
+        return Category(name=row['name'], slug=row['slug'])
+
+    def build_genre(self, row):
+        return Genre(name=row['name'], slug=row['slug'])
+
+    def build_title(self, row):
+        return Title(id=row.get('id') or None,
+                     name=row['name'],
+                     year=row['year'],
+                     description=row.get('description') or '',
+                     category_id=self.category_ids[row['category']])
+
+    def build_genre_title(self, row):
+        return Title.genre.through(title_id=row['title'], genre_id=self.genre_ids[row['genre']])
+
+    def build_user(self, row):
+        return User(username=row['username'],
+                    email=row['email'],
+                    role=row.get('role') or 'user',
+                    bio=row.get('bio') or '',
+                    first_name=row.get('first_name') or '',
+                    last_name=row.get('last_name') or '',
+                    password=self.unusable_password)
+
+    def build_review(self, row):
+        return Review(id=row.get('id') or None,
+                      title_id=row['title'],
+                      author_id=self.user_ids[row['author']],
+                      text=row['text'],
+                      score=row['score'],
+                      pub_date=row.get('pub_date') or timezone.now())
+
+    def build_comment(self, row):
+        return Comment(id=row.get('id') or None,
+                       review_id=row['review'],
+                       author_id=self.user_ids[row['author']],
+                       text=row['text'],
+                       pub_date=row.get('pub_date') or timezone.now())
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api_board.functions import rebuild_review_comments_counts, rebuild_title_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recalculate stored rating of all titles and numbers of comments of reviews, e.g. after loaddata.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_title_ratings()
+            reviews = rebuild_review_comments_counts()
+        self.stdout.write(self.style.SUCCESS('Rating rebuilt for %d titles, comments counted for %d reviews'
+                                             % (count, reviews)))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api_board.stats import rebuild_title_stats
+
+
+class Command(BaseCommand):
+    help = ('Recalculate summary table of title stats per category, genre and year, '
+            'e.g. after loaddata, rebuild_ratings or changes in admin.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_title_stats()
+        self.stdout.write(self.style.SUCCESS('Stats rebuilt, %d rows' % count))
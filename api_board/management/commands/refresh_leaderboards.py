@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api_board.leaderboards import WINDOWS, refresh_leaderboards
+
+
+class Command(BaseCommand):
+    help = ('Recompute leaderboards of top titles, e.g. after loaddata. Sliding windows move only by refresh, '
+            'run it with --loop or periodically.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, action='append', choices=WINDOWS, dest='windows',
+                            help='Days of window to refresh, 0 for all time, by default all windows')
+        parser.add_argument('--loop', action='store_true', help='Refresh until the process is stopped')
+        parser.add_argument('--interval', type=float, default=600, help='Seconds between refreshes')
+
+    def handle(self, *args, **options):
+        windows = options['windows'] or WINDOWS
+        while True:
+            started = time.monotonic()
+            count = refresh_leaderboards(windows)
+            self.stdout.write(self.style.SUCCESS('Refreshed %d leaderboards in %.1f s'
+                                                 % (count, time.monotonic() - started)))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api_board.outbox import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = ('Send emails of outbox, e.g. confirmation codes, by batches over one SMTP connection. '
+            'With --loop it keeps polling outbox as a worker.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true', help='Poll outbox until the process is stopped')
+        parser.add_argument('--interval', type=float, default=2, help='Seconds between polls of empty outbox')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_queued_emails(batch_size=options['batch_size'])
+            if sent or failed or not options['loop']:
+                self.stdout.write('Sent %d emails, %d failed' % (sent, failed))
+            if not options['loop']:
+                return
+            if not sent:
+                # Outbox is empty or emails fail, e.g. mail server is down
+                time.sleep(options['interval'])
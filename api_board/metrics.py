@@ -0,0 +1,188 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Metrics of the request handled in the current thread or task, None outside of RequestMetricsMiddleware
+current_metrics = ContextVar('current_metrics', default=None)
+
+# Sums are stored in cache as integers, times in microseconds
+TIMINGS = ('total', 'db', 'serialize', 'render')
+COUNTERS = ('requests', 'queries')
+# Routes are numbered in cache, number of routes is under ROUTES_KEY, route names under ROUTE_NUMBER_KEY,
+# ROUTE_KEY marks the route as numbered and is added once, so processes don't overwrite each other's routes
+ROUTES_KEY = 'request_metrics:routes'
+ROUTE_NUMBER_KEY = 'request_metrics:routes:number:%d'
+ROUTE_KEY = 'request_metrics:routes:name:%s'
+
+
+def get_cache():
+    return caches[getattr(settings, 'REQUEST_METRICS_CACHE', 'default')]
+
+
+class RequestMetrics:
+    """Query count and timings of one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.serializing = False
+
+    def execute(self, execute, sql, params, many, context):
+        """Database execute wrapper, see connection.execute_wrapper()."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - started
+
+    @contextmanager
+    def serialization(self):
+        """Add the time of block to serialization time, nested blocks are counted once."""
+        if self.serializing:
+            yield
+            return
+        self.serializing = True
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.serialize += time.perf_counter() - started
+            self.serializing = False
+
+
+@contextmanager
+def measure_serialization():
+    request_metrics = current_metrics.get()
+    if request_metrics is None:
+        yield
+        return
+    with request_metrics.serialization():
+        yield
+
+
+def count_query(execute, sql, params, many, context):
+    """Database execute wrapper of every connection, counts the query in metrics of the current request."""
+    request_metrics = current_metrics.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    return request_metrics.execute(execute, sql, params, many, context)
+
+
+def instrument_connection(sender, connection, **kwargs):
+    """Install count_query on connection, receiver of connection_created signal.
+
+    Connections are thread-local, so every connection is instrumented, including the ones of threads,
+    where the ASGI handler runs sync views. Metrics of the request are found by the context of the thread.
+    The wrapper is the first one, so connection.execute_wrapper() blocks remove their own wrappers.
+    """
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+class MetricsRegistry:
+    """Sums of metrics per route name, collected in process and added to cache every flush interval.
+
+    Cache is updated by incr, so processes sharing the cache don't lose each other's requests.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.flushed = time.monotonic()
+
+    def add(self, route, total, request_metrics):
+        values = {
+            'requests': 1,
+            'queries': request_metrics.queries,
+            'total': total,
+            'db': request_metrics.db,
+            'serialize': request_metrics.serialize,
+            'render': request_metrics.render,
+        }
+        with self.lock:
+            sums = self.pending.setdefault(route, dict.fromkeys(values, 0))
+            for name, value in values.items():
+                sums[name] += value
+            flush = time.monotonic() - self.flushed >= getattr(settings, 'REQUEST_METRICS_FLUSH_INTERVAL', 10)
+        if flush:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flushed = time.monotonic()
+        if not pending:
+            return
+
+        cache = get_cache()
+        # Routes are registered on every flush, since they may be removed by reset of other process
+        for route in pending:
+            self.register_route(cache, route)
+        for route, sums in pending.items():
+            for name, value in sums.items():
+                if name in TIMINGS:
+                    value = round(value * 1e6)
+                self.increment(cache, 'request_metrics:%s:%s' % (route, name), value)
+
+    def register_route(self, cache, route):
+        """Give the route a number, unless it has one, so stats find it."""
+        if cache.add(ROUTE_KEY % route, True, None):
+            cache.set(ROUTE_NUMBER_KEY % self.increment(cache, ROUTES_KEY, 1), route, None)
+
+    @staticmethod
+    def increment(cache, key, value):
+        """Add value to the integer of key, return the new value."""
+        try:
+            return cache.incr(key, value)
+        except ValueError:
+            # Key doesn't exist yet, other process may add it in the meantime
+            if not cache.add(key, value, None):
+                return cache.incr(key, value)
+            return value
+
+    @staticmethod
+    def get_routes(cache):
+        numbers = range(1, cache.get(ROUTES_KEY, 0) + 1)
+        names = cache.get_many([ROUTE_NUMBER_KEY % number for number in numbers])
+        return list(dict.fromkeys(names.values()))
+
+    def stats(self):
+        """Return averages of metrics per route name, the most loaded routes first."""
+        self.flush()
+        cache = get_cache()
+        routes = self.get_routes(cache)
+        keys = ['request_metrics:%s:%s' % (route, name) for route in routes for name in COUNTERS + TIMINGS]
+        values = cache.get_many(keys)
+        stats = []
+        for route in routes:
+            sums = {name: values.get('request_metrics:%s:%s' % (route, name), 0) for name in COUNTERS + TIMINGS}
+            requests = sums['requests']
+            if not requests:
+                continue
+            route_stats = {'route': route, 'requests': requests, 'queries': round(sums['queries'] / requests, 2)}
+            for name in TIMINGS:
+                route_stats['%s_ms' % name] = round(sums[name] / requests / 1000, 3)
+            stats.append(route_stats)
+        return sorted(stats, key=lambda item: item['requests'] * item['total_ms'], reverse=True)
+
+    def reset(self):
+        with self.lock:
+            self.pending = {}
+        cache = get_cache()
+        count = cache.get(ROUTES_KEY, 0)
+        routes = self.get_routes(cache)
+        cache.delete_many(['request_metrics:%s:%s' % (route, name)
+                           for route in routes for name in COUNTERS + TIMINGS])
+        cache.delete_many([ROUTE_KEY % route for route in routes])
+        cache.delete_many([ROUTE_NUMBER_KEY % number for number in range(1, count + 1)])
+        cache.delete(ROUTES_KEY)
+
+
+registry = MetricsRegistry()
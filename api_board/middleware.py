@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+from api_board.metrics import RequestMetrics, current_metrics, registry
+
+
+class RequestMetricsMiddleware:
+    """Record query count, database time, serialization time and latency of every request.
+
+    Metrics are added to ``Server-Timing`` header of the response and to the sums per route name,
+    e.g. ``title-list``, which admins read at ``metrics/`` endpoint. Queries are counted by execute wrapper
+    of every connection, see ``instrument_connection``, SQL isn't kept, so the cost is a few timer calls per query.
+    Serialization time is the time of serializers, render time is the time of response rendering.
+    The middleware works in both WSGI and ASGI handlers, queries of sync views run in threads by
+    the ASGI handler or by offloaded views are counted as well.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the instance as coroutine function for the handler, see MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        request_metrics = RequestMetrics()
+        token = current_metrics.set(request_metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.process_metrics(request, response, request_metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        request_metrics = RequestMetrics()
+        token = current_metrics.set(request_metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.process_metrics(request, response, request_metrics, time.perf_counter() - started)
+
+    @staticmethod
+    def process_metrics(request, response, request_metrics, total):
+        if not response.has_header('Server-Timing'):
+            response['Server-Timing'] = ', '.join([
+                'db;dur=%.3f;desc="%d queries"' % (request_metrics.db * 1000, request_metrics.queries),
+                'serialize;dur=%.3f' % (request_metrics.serialize * 1000),
+                'render;dur=%.3f' % (request_metrics.render * 1000),
+                'total;dur=%.3f' % (total * 1000),
+            ])
+        resolver_match = request.resolver_match
+        if resolver_match is not None and resolver_match.url_name:
+            registry.add(resolver_match.url_name, total, request_metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        """Rendering of DRF responses follows this hook, its time is measured till post-render callback."""
+        request_metrics = current_metrics.get()
+        if request_metrics is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                request_metrics.render += time.perf_counter() - started
+            response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,42 @@
+# Generated by Django 3.1.6 on 2026-10-18 08:21
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_title_rating(apps, schema_editor):
+    Title = apps.get_model('api_board', 'Title')
+    Review = apps.get_model('api_board', 'Review')
+    reviews = Review.objects.filter(title=OuterRef('pk')).order_by().values('title')
+    Title.objects.update(
+        score_sum=Coalesce(Subquery(reviews.annotate(value=Sum('score')).values('value')), 0),
+        score_count=Coalesce(Subquery(reviews.annotate(value=Count('id')).values('value')), 0),
+        rating=Subquery(reviews.annotate(value=Avg('score')).values('value')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_board', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='rating',
+            field=models.DecimalField(decimal_places=2, editable=False, help_text='Average score of reviews, maintained on every review write', max_digits=4, null=True),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='score_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='score_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_title_rating, migrations.RunPython.noop),
+    ]
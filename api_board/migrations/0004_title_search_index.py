@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from api_board.search import create_title_search_index, drop_title_search_index, rebuild_title_search_index
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        create_title_search_index(connection)
+        rebuild_title_search_index(connection)
+
+
+def drop_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        drop_title_search_index(connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_board', '0003_modified'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
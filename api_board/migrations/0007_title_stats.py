@@ -0,0 +1,33 @@
+# Generated by Django 3.1.6 on 2026-10-18 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_board', '0006_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category_id', models.PositiveIntegerField(default=0)),
+                ('genre_id', models.PositiveIntegerField(default=0)),
+                ('year', models.PositiveIntegerField(default=0)),
+                ('titles_count', models.IntegerField(default=0)),
+                ('reviews_count', models.IntegerField(default=0)),
+                ('score_sum', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'title stats',
+                'ordering': ('category_id', 'genre_id', 'year'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='titlestats',
+            constraint=models.UniqueConstraint(fields=('category_id', 'genre_id', 'year'), name='unique_title_stats'),
+        ),
+    ]
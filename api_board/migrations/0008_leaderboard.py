@@ -0,0 +1,48 @@
+# Generated by Django 3.1.6 on 2026-10-18 08:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_board', '0007_title_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('rating', 'rating'), ('velocity', 'velocity')], max_length=10)),
+                ('window', models.PositiveSmallIntegerField(help_text='Days of sliding window, 0 for all time')),
+                ('category_id', models.PositiveIntegerField(default=0)),
+                ('genre_id', models.PositiveIntegerField(default=0)),
+                ('value', models.FloatField(help_text='Rating or number of reviews according to metric, titles are ranked by it')),
+                ('rating', models.FloatField()),
+                ('reviews_count', models.PositiveIntegerField()),
+            ],
+            options={
+                'verbose_name_plural': 'leaderboard entries',
+                'ordering': ('-value', '-reviews_count', 'title_id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['pub_date'], name='review_pub_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='title',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api_board.title'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['metric', 'window', 'category_id', 'genre_id', '-value', '-reviews_count', 'title'], name='leaderboard_board_rank_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('metric', 'window', 'category_id', 'genre_id', 'title'), name='unique_leaderboard_entry'),
+        ),
+    ]
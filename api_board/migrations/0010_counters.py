@@ -0,0 +1,33 @@
+# Generated by Django 3.1.6 on 2026-10-18 09:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_comments(apps, schema_editor):
+    Review = apps.get_model('api_board', 'Review')
+    Comment = apps.get_model('api_board', 'Comment')
+    comments = Comment.objects.filter(review=OuterRef('pk')).order_by().values('review')
+    Review.objects.update(comments_count=Coalesce(Subquery(comments.annotate(value=Count('id')).values('value')), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_board', '0009_similar_title'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='title',
+            old_name='score_count',
+            new_name='reviews_count',
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
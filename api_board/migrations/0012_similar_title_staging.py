@@ -0,0 +1,22 @@
+# Generated by Django 3.1.6 on 2026-10-18 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_board', '0011_outgoing_email_next_attempt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarTitleStaging',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title_id', models.PositiveIntegerField()),
+                ('similar_id', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+            ],
+        ),
+    ]
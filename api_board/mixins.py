@@ -1,17 +1,225 @@
-from rest_framework import viewsets, mixins
+import calendar
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
+from django.utils.http import http_date, quote_etag
+from rest_framework import viewsets, mixins, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import SearchFilter
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
 from api_board.permissions import IsAdminOrModeratorOrAuthor, IsAdminRole
 
 
-class ReviewCommentMixin(viewsets.ModelViewSet):
+class ConditionalGetMixin:
+    """Mixin answering conditional GET of list and retrieve actions with 304 Not Modified.
+
+    Validators are built from ``etag_fields`` of the objects in one query, before anything is serialized.
+    Detail responses get strong ETag, list pages get weak ETag, since they also depend on pagination.
+    """
+    etag_fields = ('modified',)
+    # Number of objects of the list counted with its validators
+    list_count = None
+
+    def make_etag(self, *markers):
+        value = repr((self.request.accepted_media_type, *markers))
+        return quote_etag(hashlib.md5(value.encode()).hexdigest())
+
+    @staticmethod
+    def make_last_modified(markers):
+        dates = [marker for marker in markers if marker is not None]
+        if not dates:
+            return None
+        return calendar.timegm(max(dates).utctimetuple())
+
+    def get_list_validators(self):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        aggregates = {'marker_%d' % i: Max(field) for i, field in enumerate(self.etag_fields)}
+        # Stored number of objects, e.g. counter of parent object, replaces COUNT
+        count = self.get_pagination_count()
+        if count is None:
+            aggregates['count'] = Count('pk')
+        markers = queryset.aggregate(**aggregates)
+        self.list_count = markers.get('count', count)
+        dates = [markers['marker_%d' % i] for i in range(len(self.etag_fields))]
+        etag = 'W/' + self.make_etag(self.request.get_full_path(), self.list_count, *dates)
+        return etag, self.make_last_modified(dates)
+
+    def get_pagination_count(self):
+        """Return number of objects of the list counted by validators, so the page doesn't count them again."""
+        return self.list_count
+
+    def get_detail_validators(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            dates = queryset.values_list(*self.etag_fields).first()
+        except (TypeError, ValueError, DjangoValidationError):
+            # Invalid lookup value, get_object() answers 404 like for a missing object
+            return None, None
+        if dates is None:
+            return None, None
+        return self.make_etag(self.request.get_full_path(), *dates), self.make_last_modified(dates)
+
+    def conditional_response(self, validators, handler, request, *args, **kwargs):
+        etag, last_modified = validators
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if etag is not None and response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(self.get_list_validators(), super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(self.get_detail_validators(), super().retrieve, request, *args, **kwargs)
+
+
+class SparseFieldsetMixin:
+    """Mixin with ``fields`` and ``expand`` query params of list and retrieve actions.
+
+    ``fields`` is a comma separated list of rendered fields, ``expand`` lists the relations rendered
+    as nested objects, other relations are rendered by slug. Without params all fields are rendered and expanded.
+    ``get_sparse_queryset`` loads only the columns and relations of rendered fields.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+    sparse_actions = ('list', 'retrieve')
+
+    def get_query_param_list(self, name):
+        if self.action not in self.sparse_actions or name not in self.request.query_params:
+            return None
+        value = self.request.query_params[name]
+        return {item.strip() for item in value.split(',') if item.strip()}
+
+    def get_sparse_fields(self):
+        """Return names of rendered fields, None if all fields are rendered."""
+        return self.get_query_param_list(self.fields_query_param)
+
+    def get_expanded_fields(self):
+        """Return names of expanded relations, None if all relations are expanded."""
+        return self.get_query_param_list(self.expand_query_param)
+
+    def get_sparse_queryset(self, queryset, select_related=(), prefetch_related=()):
+        """Return queryset, which joins and prefetches only rendered relations and defers other columns."""
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset.select_related(*select_related).prefetch_related(*prefetch_related)
+
+        queryset = queryset.select_related(*(name for name in select_related if name in fields))
+        queryset = queryset.prefetch_related(*(name for name in prefetch_related if name in fields))
+        model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+        ordering = [name.lstrip('-') for name in getattr(self, 'cursor_ordering', None) or ()]
+        return queryset.only('id', *ordering, *(fields & model_fields))
+
+
+class FastListMixin:
+    """Mixin rendering list action by ``fast_list_serializer`` (ValuesSerializer) from values() rows.
+
+    Output is the same as the one of the serializer class of view, model instances aren't built.
+    Requests with ``fields`` or ``expand`` params of SparseFieldsetMixin are rendered by the serializer class.
+    """
+    fast_list_serializer = None
+
+    def use_fast_list(self):
+        if self.fast_list_serializer is None:
+            return False
+        return self.get_sparse_fields() is None and self.get_expanded_fields() is None
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.fast_list_serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.fast_list_serializer.serialize(page))
+        return Response(self.fast_list_serializer.serialize(queryset))
+
+
+class BulkWriteMixin:
+    """Mixin with bulk create (POST) and bulk partial update (PATCH) of objects on ``bulk/`` url.
+
+    The whole list is validated first and errors are reported per item in order of the payload.
+    Objects are written in a single transaction only when every item is valid.
+    """
+    bulk_max_items = 1000
+
+    def get_bulk_data(self, request):
+        data = request.data
+        if not isinstance(data, list):
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: ['Expected a list of items.']})
+        if len(data) > self.bulk_max_items:
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                'Ensure this list has no more than %d items.' % self.bulk_max_items
+            ]})
+        return data
+
+    @action(detail=False, methods=['POST'], url_path='bulk', url_name='bulk')
+    def bulk_create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=self.get_bulk_data(request), many=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            self.perform_bulk_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def perform_bulk_create(self, serializer):
+        self.perform_create(serializer)
+
+    @bulk_create.mapping.patch
+    def bulk_update(self, request, *args, **kwargs):
+        data = self.get_bulk_data(request)
+        ids = [item.get('id') for item in data if isinstance(item, dict)]
+        instances = self.get_queryset().in_bulk([pk for pk in ids if isinstance(pk, int)])
+
+        serializers, errors = [], []
+        for item in data:
+            instance = instances.get(item.get('id')) if isinstance(item, dict) else None
+            if instance is None:
+                serializers.append(None)
+                errors.append({'id': ['Object with this id is not found.']})
+                continue
+            self.check_object_permissions(request, instance)
+            serializer = self.get_serializer(instance, data=item, partial=True)
+            serializers.append(serializer)
+            errors.append({} if serializer.is_valid() else serializer.errors)
+        if any(errors):
+            raise ValidationError(errors)
+
+        with transaction.atomic():
+            for serializer in serializers:
+                self.perform_update(serializer)
+        return Response([serializer.data for serializer in serializers])
+
+
+class ReviewCommentMixin(ConditionalGetMixin, SparseFieldsetMixin, FastListMixin, viewsets.ModelViewSet):
     """ Mixin with permissions where users can publishing their review and view it."""
     serializer_class = None
     model = None
     related_model = None
     related_field = str()
+    related_lookups = None
+    # Field of parent object with the stored number of objects, it's used by pagination instead of COUNT
+    counter_field = None
+    list_select_related = ('author',)
+    cursor_ordering = ('pub_date', 'id')
     http_method_names = ['get', 'post', 'patch', 'delete']
 
     def get_permissions(self):
@@ -20,37 +228,108 @@ class ReviewCommentMixin(viewsets.ModelViewSet):
             permission_classes = [AllowAny]
         elif self.action == 'create':
             permission_classes = [IsAuthenticated]
-        elif self.action in ['partial_update', 'destroy']:
+        elif self.action in ['partial_update', 'bulk_update', 'destroy']:
             permission_classes = [IsAdminOrModeratorOrAuthor]
         else:
             permission_classes = [IsAdminRole]
         return [permission() for permission in permission_classes]
 
+    @cached_property
+    def related_object(self):
+        """Parent object of the url, the whole chain of parents is checked by a single query once per request."""
+        lookups = {field: self.kwargs.get(kwarg) for field, kwarg in self.get_related_lookups().items()}
+        return get_object_or_404(self.related_model, **lookups)
+
+    def get_related_lookups(self):
+        """Return mapping of parent model field to url kwarg."""
+        if self.related_lookups is not None:
+            return self.related_lookups
+        return {'id': self.related_field + '_id'}
+
+    def get_pagination_count(self):
+        """Return the stored number of objects of the parent object."""
+        if self.counter_field is None:
+            return super().get_pagination_count()
+        return getattr(self.related_object, self.counter_field)
+
     def get_queryset(self):
-        obj_id = self.kwargs.get(self.related_field + '_id')
-        obj = get_object_or_404(self.related_model, id=obj_id)
         data = {
-            self.related_field: obj
+            self.related_field: self.related_object
         }
         queryset = self.model.objects.filter(**data)
-        return queryset
+        return self.get_sparse_queryset(queryset, select_related=self.list_select_related)
 
     def perform_create(self, serializer):
-        user = self.request.user
-        obj_id = self.kwargs.get(self.related_field + '_id')
-        obj = get_object_or_404(self.related_model, id=obj_id)
         data = {
-            'author': user,
-            self.related_field: obj
+            'author': self.request.user,
+            self.related_field: self.related_object
         }
         serializer.save(**data)
 
 
-class CategoryGenreMixin(mixins.CreateModelMixin,
+class ListCacheMixin:
+    """Mixin caching data of list responses in Django cache framework.
+
+    All cached pages of a model share a version, which is replaced after commit of create and destroy,
+    so every page becomes stale at once. A page built from data read before the change is stored
+    under the old version and is never served.
+    The version is replaced only in the cache of the writing process, if the cache isn't shared
+    by processes (LocMemCache), so pages are kept there for ``list_cache_local_timeout`` only.
+    """
+    list_cache_alias = None
+    list_cache_timeout = 60 * 60
+    list_cache_local_timeout = 10
+
+    @property
+    def list_cache(self):
+        return caches[self.list_cache_alias or getattr(settings, 'LIST_CACHE', 'default')]
+
+    def get_list_cache_timeout(self):
+        if isinstance(self.list_cache, LocMemCache):
+            return min(self.list_cache_timeout, self.list_cache_local_timeout)
+        return self.list_cache_timeout
+
+    def get_list_cache_prefix(self):
+        return 'list:%s' % self.get_queryset().model._meta.label_lower
+
+    def get_list_cache_version(self):
+        version_key = self.get_list_cache_prefix() + ':version'
+        version = self.list_cache.get(version_key)
+        if version is None:
+            self.list_cache.add(version_key, time.time_ns(), timeout=None)
+            version = self.list_cache.get(version_key)
+        return version
+
+    def invalidate_list_cache(self):
+        self.list_cache.set(self.get_list_cache_prefix() + ':version', time.time_ns(), timeout=None)
+
+    def list(self, request, *args, **kwargs):
+        url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        key = '%s:%s' % (self.get_list_cache_prefix(), url_hash)
+        version = self.get_list_cache_version()
+        data = self.list_cache.get(key, version=version)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        self.list_cache.set(key, response.data, self.get_list_cache_timeout(), version=version)
+        return response
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        transaction.on_commit(self.invalidate_list_cache)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        transaction.on_commit(self.invalidate_list_cache)
+
+
+class CategoryGenreMixin(ListCacheMixin,
+                         mixins.CreateModelMixin,
                          mixins.ListModelMixin,
                          mixins.DestroyModelMixin,
                          viewsets.GenericViewSet):
-    """Mixin for category and genre."""
+    """Mixin for category and genre, lists are cached until a category or genre is created or deleted."""
     lookup_field = 'slug'
     filter_backends = [SearchFilter]
     search_fields = ['name']
@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 from django.utils.text import Truncator
 from django.utils.translation import gettext_lazy as _
 
@@ -35,7 +36,27 @@ class User(AbstractUser):
         return self.username
 
 
-class Comment(models.Model):
+class ModifiedModel(models.Model):
+    """Abstract model with date of the last change, which is used as validator of conditional GET."""
+    modified = models.DateTimeField('date modified', default=timezone.now, editable=False)
+    # Columns maintained by UPDATE with F-expressions, save of a stored instance doesn't overwrite them
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        self.modified = timezone.now()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and self.counter_fields and not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = [field.name for field in self._meta.concrete_fields
+                             if not field.primary_key and field.name not in self.counter_fields]
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'modified'}
+        super().save(*args, **kwargs)
+
+
+class Comment(ModifiedModel):
     text = models.CharField(max_length=655)
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
@@ -47,6 +68,9 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('pub_date',)
+        indexes = [
+            models.Index(fields=['review', 'pub_date', 'id'], name='comment_review_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text
@@ -64,7 +88,7 @@ class Category(models.Model):
         return self.name
 
 
-class Title(models.Model):
+class Title(ModifiedModel):
     name = models.CharField(max_length=50)
     year = models.PositiveIntegerField()
     description = models.CharField(max_length=255, blank=True)
@@ -72,9 +96,23 @@ class Title(models.Model):
                                  on_delete=models.CASCADE,
                                  related_name='titles')
     genre = models.ManyToManyField('Genre', related_name='genres')
+    score_sum = models.PositiveIntegerField(default=0, editable=False)
+    reviews_count = models.PositiveIntegerField(default=0, editable=False)
+    rating = models.DecimalField(max_digits=4,
+                                 decimal_places=2,
+                                 null=True,
+                                 editable=False,
+                                 help_text='Average score of reviews, maintained on every review write')
+
+    counter_fields = ('score_sum', 'reviews_count', 'rating')
 
     class Meta:
         ordering = ('id',)
+        indexes = [
+            models.Index(fields=['year', 'id'], name='title_year_idx'),
+            # Last change of titles, validator of conditional GET of the list
+            models.Index(fields=['modified'], name='title_modified_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -91,7 +129,7 @@ class Genre(models.Model):
         return self.name
 
 
-class Review(models.Model):
+class Review(ModifiedModel):
     text = models.TextField()
     score = models.SmallIntegerField(validators=[MaxValueValidator(10),
                                                  MinValueValidator(1)])
@@ -102,6 +140,9 @@ class Review(models.Model):
     title = models.ForeignKey(Title,
                               on_delete=models.CASCADE,
                               related_name='reviews')
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ('comments_count',)
 
     class Meta:
         constraints = [
@@ -109,6 +150,125 @@ class Review(models.Model):
                                     name='unique_author_title'),
         ]
         ordering = ('pub_date',)
+        indexes = [
+            models.Index(fields=['title', 'pub_date', 'id'], name='review_title_pub_date_idx'),
+            # Recent reviews of sliding windows of leaderboards
+            models.Index(fields=['pub_date'], name='review_pub_date_idx'),
+        ]
 
     def __str__(self):
         return Truncator(self.text).chars(120)
+
+
+class OutgoingEmail(models.Model):
+    """Email waiting in outbox for send_queued_email worker, it's deleted once sent."""
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    recipient = models.EmailField()
+    created = models.DateTimeField(default=timezone.now, editable=False)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Email isn't sent before this time, it's moved by failed attempts and by claim of worker
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ('id',)
+
+    def __str__(self):
+        return '%s: %s' % (self.recipient, self.subject)
+
+
+class TitleStats(models.Model):
+    """Number of titles and sum of their review scores per category, genre and year.
+
+    Zero in category_id, genre_id or year means any value, e.g. the row (category, 0, 0) holds totals
+    of all titles of the category and (0, 0, 0) holds totals of all titles. Rows are kept up to date by
+    title and review writes of the API, see api_board.stats, and rebuilt by rebuild_stats command.
+    """
+    category_id = models.PositiveIntegerField(default=0)
+    genre_id = models.PositiveIntegerField(default=0)
+    year = models.PositiveIntegerField(default=0)
+    titles_count = models.IntegerField(default=0)
+    reviews_count = models.IntegerField(default=0)
+    score_sum = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ('category_id', 'genre_id', 'year')
+        verbose_name_plural = _('title stats')
+        constraints = [
+            models.UniqueConstraint(fields=['category_id', 'genre_id', 'year'], name='unique_title_stats'),
+        ]
+
+    def __str__(self):
+        return 'category %s, genre %s, year %s' % (self.category_id or 'any', self.genre_id or 'any',
+                                                   self.year or 'any')
+
+
+class LeaderboardEntry(models.Model):
+    """Title among the top ones of a leaderboard by rating or number of reviews over a window of days.
+
+    Board is identified by metric, window and category_id or genre_id, zero means any category or genre
+    as in TitleStats. Entries are kept up to date by review and title writes, see api_board.leaderboards,
+    and recomputed by refresh_leaderboards command, which also moves sliding windows.
+    """
+    METRIC_CHOICES = (
+        ('rating', 'rating'),
+        ('velocity', 'velocity'),
+    )
+
+    metric = models.CharField(max_length=10, choices=METRIC_CHOICES)
+    window = models.PositiveSmallIntegerField(help_text='Days of sliding window, 0 for all time')
+    category_id = models.PositiveIntegerField(default=0)
+    genre_id = models.PositiveIntegerField(default=0)
+    title = models.ForeignKey(Title,
+                              on_delete=models.CASCADE,
+                              related_name='+')
+    value = models.FloatField(help_text='Rating or number of reviews according to metric, titles are ranked by it')
+    rating = models.FloatField()
+    reviews_count = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ('-value', '-reviews_count', 'title_id')
+        verbose_name_plural = _('leaderboard entries')
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'window', 'category_id', 'genre_id', 'title'],
+                                    name='unique_leaderboard_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['metric', 'window', 'category_id', 'genre_id', '-value', '-reviews_count', 'title'],
+                         name='leaderboard_board_rank_idx'),
+        ]
+
+    def __str__(self):
+        return '%s of %s days: %s' % (self.metric, self.window or 'all', self.title_id)
+
+
+class SimilarTitle(models.Model):
+    """Title among the most similar ones to another title by scores of users, who reviewed both.
+
+    Rows are computed offline by build_similar_titles command and replaced as a whole.
+    """
+    title = models.ForeignKey(Title,
+                              on_delete=models.CASCADE,
+                              related_name='+')
+    similar = models.ForeignKey(Title,
+                                on_delete=models.CASCADE,
+                                related_name='+')
+    score = models.FloatField(help_text='Similarity of scores, shrunk for titles with few common reviewers')
+
+    class Meta:
+        ordering = ('title', '-score')
+        indexes = [
+            models.Index(fields=['title', '-score', 'similar'], name='similar_title_score_idx'),
+        ]
+
+    def __str__(self):
+        return '%s: %s' % (self.title_id, self.similar_id)
+
+
+class SimilarTitleStaging(models.Model):
+    """Row of the index of similar titles written by build_similar_titles before it replaces SimilarTitle."""
+    title_id = models.PositiveIntegerField()
+    similar_id = models.PositiveIntegerField()
+    score = models.FloatField()
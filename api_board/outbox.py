@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+from api_board.models import OutgoingEmail
+
+# Emails, which failed this number of times, stay in outbox for inspection and aren't sent again
+MAX_ATTEMPTS = 5
+# Delay after the first failed attempt, it's doubled by every next one, so attempts span a longer outage
+RETRY_DELAY = timedelta(minutes=1)
+# Claimed emails are skipped by other workers for this time, after it emails of a stopped worker are sent again
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def queue_email(subject, message, recipient, from_email=None):
+    """Put email to outbox, it's sent by send_queued_email worker."""
+    return OutgoingEmail.objects.create(subject=subject, message=message, recipient=recipient,
+                                        from_email=from_email or '')
+
+
+def retry_delay(attempts):
+    return RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def claim_batch(batch_size, after_id=0):
+    """Return queued emails due to be sent with id after after_id and move their next attempt by CLAIM_TIMEOUT.
+
+    Rows are locked only by this short transaction, where the database can skip locked rows,
+    so workers don't claim the same emails.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = (OutgoingEmail.objects.filter(id__gt=after_id, attempts__lt=MAX_ATTEMPTS, next_attempt_at__lte=now)
+                    .order_by('id'))
+        if db_connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        emails = list(queryset[:batch_size])
+        OutgoingEmail.objects.filter(id__in=[email.id for email in emails]).update(next_attempt_at=now + CLAIM_TIMEOUT)
+    return emails
+
+
+def send_queued_batch(connection, batch_size, after_id=0):
+    """Claim queued emails with id after after_id and send them over the open mail connection.
+
+    Emails are sent outside of transaction, so slow mail server doesn't hold locks. Sent emails are deleted,
+    failed ones get the error and the next attempt after retry_delay.
+    Return numbers of sent and failed emails and id of the last email of the batch.
+    """
+    emails = claim_batch(batch_size, after_id)
+    sent, failed = [], []
+    for email in emails:
+        message = EmailMessage(subject=email.subject, body=email.message, from_email=email.from_email or None,
+                               to=[email.recipient], connection=connection)
+        try:
+            message.send()
+        except Exception as error:
+            email.attempts += 1
+            email.last_error = repr(error)
+            email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+            failed.append(email)
+            reopen(connection)
+        else:
+            sent.append(email.id)
+
+    with transaction.atomic():
+        OutgoingEmail.objects.filter(id__in=sent).delete()
+        OutgoingEmail.objects.bulk_update(failed, ['attempts', 'last_error', 'next_attempt_at'])
+    return len(sent), len(failed), emails[-1].id if emails else after_id
+
+
+def reopen(connection):
+    """Open mail connection again after error, e.g. disconnect by server, errors are left to the next send."""
+    try:
+        connection.close()
+        connection.open()
+    except Exception:
+        pass
+
+
+def send_queued_emails(batch_size=100, connection=None):
+    """Send all queued emails by batches over one mail connection, return numbers of sent and failed emails.
+
+    Every email is tried once per call, so failing emails don't use their attempts in one run.
+    """
+    connection = connection or get_connection()
+    total_sent = total_failed = last_id = 0
+    with connection:
+        while True:
+            sent, failed, last_id = send_queued_batch(connection, batch_size, last_id)
+            total_sent += sent
+            total_failed += failed
+            if sent + failed < batch_size:
+                return total_sent, total_failed
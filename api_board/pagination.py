@@ -0,0 +1,81 @@
+from functools import partial
+
+from django.core.paginator import Paginator
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class CountedPaginator(Paginator):
+    """Django paginator, which takes the number of objects instead of counting them by a query."""
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            self.count = count
+
+
+class PageNumberOrCursorPagination(PageNumberPagination):
+    """Page number pagination, which switches to cursor pagination on demand.
+
+    Client opts in with ``?pagination=cursor`` and then follows ``next`` and ``previous`` links,
+    which carry the ``cursor`` param. Cursor pages don't run COUNT and don't scan skipped rows by OFFSET.
+    Cursor mode is available only for views with ``cursor_ordering`` attribute, other views
+    and requests without the param keep page numbers.
+    Views with ``get_pagination_count`` method give the number of objects, e.g. from a stored counter,
+    so their pages don't run COUNT either.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+
+    def __init__(self):
+        self.cursor_paginator = None
+
+    def use_cursor(self, request, view):
+        if getattr(view, 'cursor_ordering', None) is None:
+            return False
+        query_params = request.query_params
+        return (query_params.get(self.mode_query_param) == self.cursor_mode
+                or CursorPagination.cursor_query_param in query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.use_cursor(request, view):
+            if hasattr(view, 'get_pagination_count'):
+                self.django_paginator_class = partial(CountedPaginator, count=view.get_pagination_count())
+            return super().paginate_queryset(queryset, request, view)
+
+        self.cursor_paginator = CursorPagination()
+        self.cursor_paginator.page_size = self.page_size
+        self.cursor_paginator.ordering = view.cursor_ordering
+        page = self.cursor_paginator.paginate_queryset(queryset, request, view)
+        self.display_page_controls = getattr(self.cursor_paginator, 'display_page_controls', False)
+        return page
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_html_context()
+        return super().get_html_context()
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        if getattr(view, 'cursor_ordering', None) is not None:
+            parameters += CursorPagination().get_schema_operation_parameters(view)
+            parameters.append({
+                'name': self.mode_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Set to "cursor" to paginate by cursor instead of page number.',
+                'schema': {
+                    'type': 'string',
+                    'enum': [self.cursor_mode],
+                },
+            })
+        return parameters
@@ -30,4 +30,4 @@ class IsAdminOrModeratorOrAuthor(BasePermission):
             return True
         if request.user.role == 'moderator':
             return True
-        return obj.author == request.user
+        return obj.author_id == request.user.id
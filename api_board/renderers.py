@@ -0,0 +1,121 @@
+import json
+from collections import OrderedDict
+from json.encoder import encode_basestring, encode_basestring_ascii
+
+from rest_framework.renderers import JSONRenderer
+
+# Encoded prefixes of dicts are cached per tuple of keys, the number of shapes is bounded for arbitrary data
+MAX_CACHED_SHAPES = 1000
+
+
+class JSONFragment(OrderedDict):
+    """Dict, which is shared by many objects of response, e.g. category of titles, and is encoded only once.
+
+    Fragments are read-only, their encoded text is cached on the first rendering.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.encoded = {}
+
+
+class FragmentJSONRenderer(JSONRenderer):
+    """JSON renderer, which splices cached encoded text of JSONFragment objects and of dict keys.
+
+    Strings, integers, lists and dicts are encoded by a walk over data, other values by the encoder
+    of JSONRenderer. Output is the same as the one of JSONRenderer. Indented output, e.g. of browsable API,
+    and non-compact settings are rendered by JSONRenderer.
+    """
+    shapes = {}
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if data is None or not self.compact or self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        parts = []
+        self.encode(data, parts, encode_basestring_ascii if self.ensure_ascii else encode_basestring)
+        ret = ''.join(parts)
+        # See JSONRenderer, these characters are valid JSON but not valid JavaScript
+        ret = ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        return ret.encode()
+
+    def encode_fallback(self, value):
+        return json.dumps(value, cls=self.encoder_class, ensure_ascii=self.ensure_ascii,
+                          allow_nan=not self.strict, separators=(',', ':'))
+
+    def get_prefixes(self, keys, encode_string):
+        """Return encoded '{"key":' and ',"key":' parts of dict with the keys, None for keys other than strings."""
+        cache_key = (keys, encode_string)
+        prefixes = self.shapes.get(cache_key)
+        if prefixes is None:
+            if not all(type(key) is str for key in keys):
+                return None
+            prefixes = tuple(('{' if i == 0 else ',') + encode_string(key) + ':' for i, key in enumerate(keys))
+            if len(self.shapes) < MAX_CACHED_SHAPES:
+                self.shapes[cache_key] = prefixes
+        return prefixes
+
+    def encode(self, value, parts, encode_string):
+        value_type = type(value)
+        if value_type is str:
+            parts.append(encode_string(value))
+        elif value_type is int:
+            parts.append(int.__repr__(value))
+        elif value is None:
+            parts.append('null')
+        elif value_type is JSONFragment:
+            encoded = value.encoded.get(encode_string)
+            if encoded is None:
+                fragment_parts = []
+                self.encode_dict(value, fragment_parts, encode_string)
+                encoded = value.encoded[encode_string] = ''.join(fragment_parts)
+            parts.append(encoded)
+        elif isinstance(value, dict):
+            self.encode_dict(value, parts, encode_string)
+        elif isinstance(value, (list, tuple)):
+            self.encode_list(value, parts, encode_string)
+        elif value is True:
+            parts.append('true')
+        elif value is False:
+            parts.append('false')
+        else:
+            parts.append(self.encode_fallback(value))
+
+    # Loops below encode strings and integers inline, it saves a call per value
+
+    def encode_list(self, value, parts, encode_string):
+        if not value:
+            parts.append('[]')
+            return
+        separator = '['
+        for item in value:
+            parts.append(separator)
+            item_type = type(item)
+            if item_type is str:
+                parts.append(encode_string(item))
+            elif item_type is int:
+                parts.append(int.__repr__(item))
+            else:
+                self.encode(item, parts, encode_string)
+            separator = ','
+        parts.append(']')
+
+    def encode_dict(self, value, parts, encode_string):
+        if not value:
+            parts.append('{}')
+            return
+        prefixes = self.get_prefixes(tuple(value), encode_string)
+        if prefixes is None:
+            parts.append(self.encode_fallback(value))
+            return
+        for prefix, item in zip(prefixes, value.values()):
+            parts.append(prefix)
+            item_type = type(item)
+            if item_type is str:
+                parts.append(encode_string(item))
+            elif item_type is int:
+                parts.append(int.__repr__(item))
+            else:
+                self.encode(item, parts, encode_string)
+        parts.append('}')
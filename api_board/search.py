@@ -0,0 +1,84 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'api_board_title_fts'
+
+# External content FTS5 table over name and description of titles, kept in sync by triggers.
+CREATE_INDEX_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+    "name, description, content='api_board_title', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+
+    "CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON api_board_title BEGIN "
+    "INSERT INTO {fts}(rowid, name, description) VALUES (new.id, new.name, new.description); "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON api_board_title BEGIN "
+    "INSERT INTO {fts}({fts}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF name, description ON api_board_title BEGIN "
+    "INSERT INTO {fts}({fts}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO {fts}(rowid, name, description) VALUES (new.id, new.name, new.description); "
+    "END",
+]
+
+DROP_INDEX_SQL = [
+    'DROP TRIGGER IF EXISTS {fts}_ai',
+    'DROP TRIGGER IF EXISTS {fts}_ad',
+    'DROP TRIGGER IF EXISTS {fts}_au',
+    'DROP TABLE IF EXISTS {fts}',
+]
+
+# Matches in name weigh more than matches in description
+MATCH_SQL = 'SELECT rowid FROM {fts} WHERE {fts} MATCH %s'
+RANK_SQL = 'SELECT bm25({fts}, 10.0, 1.0) FROM {fts} WHERE {fts} MATCH %s AND rowid = "api_board_title"."id"'
+
+
+def create_title_search_index(connection):
+    """Create full-text index of titles and triggers, which keep it in sync, if they don't exist."""
+    with connection.cursor() as cursor:
+        for sql in CREATE_INDEX_SQL:
+            cursor.execute(sql.format(fts=FTS_TABLE))
+
+
+def rebuild_title_search_index(connection):
+    """Fill full-text index from the current content of titles."""
+    with connection.cursor() as cursor:
+        cursor.execute("INSERT INTO {fts}({fts}) VALUES ('rebuild')".format(fts=FTS_TABLE))
+
+
+def drop_title_search_index(connection):
+    with connection.cursor() as cursor:
+        for sql in DROP_INDEX_SQL:
+            cursor.execute(sql.format(fts=FTS_TABLE))
+
+
+def build_match_expression(text):
+    """Return FTS5 query where every word of text is required as a prefix, None if text has no words.
+
+    Words are quoted, so operators and special characters of FTS5 syntax in user input are ignored.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return ' '.join('"%s"*' % word for word in words)
+
+
+def search_titles(queryset, text):
+    """Filter titles by words of text in name and description, the most relevant titles first.
+
+    On SQLite the FTS5 index is used, other databases fall back to substring search.
+    """
+    match = build_match_expression(text)
+    if match is None:
+        return queryset.none()
+    if connections[queryset.db].vendor != 'sqlite':
+        return queryset.filter(Q(name__icontains=text) | Q(description__icontains=text))
+
+    matches = RawSQL(MATCH_SQL.format(fts=FTS_TABLE), (match,))
+    rank = RawSQL(RANK_SQL.format(fts=FTS_TABLE), (match,))
+    return queryset.filter(id__in=matches).annotate(search_rank=rank).order_by('search_rank', 'id')
@@ -1,24 +1,71 @@
+from collections import OrderedDict
+
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils.functional import cached_property
+from django.utils.timezone import now
 from rest_framework import exceptions
 from rest_framework import serializers, status
+from rest_framework.settings import api_settings
 
-from api_board.functions import generate_slug
-from api_board.models import Category, Genre, Title, Review, Comment
+from api_board.functions import create_unique, generate_slug, generate_username
+from api_board.metrics import measure_serialization
+from api_board.leaderboards import METRICS, TOP_K, WINDOWS
+from api_board.models import Category, Genre, Title, Review, Comment, TitleStats, LeaderboardEntry, SimilarTitle
+from api_board.renderers import JSONFragment
+from api_board.stats import DIMENSIONS
 
 User = get_user_model()
 
 
-class CreateUserSerializer(serializers.ModelSerializer):
+class MeasuredSerializerMixin:
+    """Serializer mixin adding time of representation to serialization time of RequestMetricsMiddleware."""
+
+    def to_representation(self, instance):
+        with measure_serialization():
+            return super().to_representation(instance)
+
+
+class SparseFieldsMixin:
+    """Serializer mixin rendering only the fields and expanded relations requested from SparseFieldsetMixin view.
+
+    Relations of ``Meta.expandable_fields``, which aren't expanded, are rendered by slug.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        view = self.context.get('view')
+        if not hasattr(view, 'get_sparse_fields'):
+            return fields
+
+        requested = view.get_sparse_fields()
+        if requested is not None:
+            fields = OrderedDict((name, field) for name, field in fields.items() if name in requested)
+        expanded = view.get_expanded_fields()
+        if expanded is not None:
+            for name in getattr(self.Meta, 'expandable_fields', []):
+                if name in fields and name not in expanded:
+                    many = isinstance(fields[name], serializers.ListSerializer)
+                    fields[name] = serializers.SlugRelatedField(slug_field='slug', many=many, read_only=True)
+        return fields
+
+
+class CreateUserSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['email', 'username']
+        extra_kwargs = {'username': {'required': False}}
 
     def create(self, validated_data):
-        user = User.objects.create_user(**validated_data)
-        return user
+        """Username is generated from email, if it isn't given."""
+        if 'username' in validated_data:
+            return User.objects.create_user(**validated_data)
+        return create_unique(User, 'username',
+                             generate=lambda: generate_username(User, validated_data['email']),
+                             create=lambda username: User.objects.create_user(username=username, **validated_data))
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['first_name', 'last_name', 'username', 'bio', 'email', 'role']
@@ -30,10 +77,14 @@ class UserSerializer(serializers.ModelSerializer):
         if validated_data.get('role', False) and user.role != 'admin' and not user.is_superuser:
             raise exceptions.PermissionDenied(detail={"role": "Only admin can change role"},
                                               code=status.HTTP_403_FORBIDDEN)
+        if validated_data.get('username', instance.username) != instance.username:
+            # Reviews and comments are rendered with username of author
+            instance.reviews.update(modified=now())
+            instance.comments.update(modified=now())
         return super().update(instance, validated_data)
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     slug = serializers.SlugField(required=False)
 
     class Meta:
@@ -41,14 +92,13 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['name', 'slug']
 
     def create(self, validated_data):
-        validated_data['slug'] = generate_slug(slug=validated_data.get('slug'),
-                                               name=validated_data.get('name'),
-                                               obj=Category)
-        category = Category.objects.create(**validated_data)
-        return category
+        slug = validated_data.pop('slug', None)
+        return create_unique(Category, 'slug',
+                             generate=lambda: generate_slug(slug=slug, name=validated_data.get('name'), obj=Category),
+                             create=lambda value: Category.objects.create(slug=value, **validated_data))
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     slug = serializers.SlugField(required=False)
 
     class Meta:
@@ -57,21 +107,21 @@ class GenreSerializer(serializers.ModelSerializer):
         ordering = ['name']
 
     def create(self, validated_data):
-        validated_data['slug'] = generate_slug(slug=validated_data.get('slug'),
-                                               name=validated_data.get('name'),
-                                               obj=Genre)
-        genre = Genre.objects.create(**validated_data)
-        return genre
+        slug = validated_data.pop('slug', None)
+        return create_unique(Genre, 'slug',
+                             generate=lambda: generate_slug(slug=slug, name=validated_data.get('name'), obj=Genre),
+                             create=lambda value: Genre.objects.create(slug=value, **validated_data))
 
 
-class TitleSerializerGet(serializers.ModelSerializer):
+class TitleSerializerGet(MeasuredSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     category = CategorySerializer()
     genre = GenreSerializer(many=True)
-    rating = serializers.DecimalField(max_digits=3, decimal_places=2, read_only=True)
+    rating = serializers.DecimalField(max_digits=4, decimal_places=2, read_only=True)
 
     class Meta:
         model = Title
-        fields = ['id', 'name', 'year', 'rating', 'description', 'genre', 'category']
+        fields = ['id', 'name', 'year', 'rating', 'reviews_count', 'description', 'genre', 'category']
+        expandable_fields = ['genre', 'category']
 
 
 class TitleSerializerPost(TitleSerializerGet):
@@ -87,7 +137,7 @@ class TitleSerializerPost(TitleSerializerGet):
         fields = ['id', 'name', 'year', 'description', 'genre', 'category']
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(MeasuredSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.SlugRelatedField(many=False,
                                           read_only=True,
                                           slug_field='username')
@@ -97,18 +147,29 @@ class ReviewSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Review
-        fields = ['id', 'author', 'title', 'text', 'score', 'pub_date']
+        fields = ['id', 'author', 'title', 'text', 'score', 'pub_date', 'comments_count']
 
-    def validate(self, attrs):
-        """Validate every author can create only one review."""
-        author = self.context['request'].user
-        title = self.context['view'].kwargs.get('title_id')
-        if Review.objects.filter(author=author, title=title) and self.context['request'].method == 'POST':
-            raise serializers.ValidationError("For each title the user can create only one review")
-        return attrs
+    default_error_messages = {
+        'unique_author_title': 'For each title the user can create only one review',
+    }
+
+    def create(self, validated_data):
+        """Every author can create only one review, it's guaranteed by unique_author_title constraint.
 
+        Other integrity errors, e.g. of title deleted concurrently, aren't errors of the data and are raised.
+        """
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            if not Review.objects.filter(author=validated_data['author'], title=validated_data['title']).exists():
+                raise
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [self.error_messages['unique_author_title']]}
+            )
 
-class CommentSerializer(serializers.ModelSerializer):
+
+class CommentSerializer(MeasuredSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.SlugRelatedField(many=False,
                                           read_only=True,
                                           slug_field='username')
@@ -116,3 +177,176 @@ class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = ['id', 'text', 'author', 'pub_date']
+
+
+class ValuesSerializer:
+    """Read-only serializer, which renders the output of ``serializer_class`` from values() rows.
+
+    Accessors of fields are compiled once, so a row costs only dict lookups and to_representation
+    of leaf fields instead of the field machinery of ModelSerializer. Supported fields are model fields,
+    SlugRelatedField and nested serializer of forward relation, nested serializer with many=True
+    of many-to-many field; the latter is loaded by one query per page.
+    Nested objects are interned as JSONFragment, so FragmentJSONRenderer encodes each of them once.
+    """
+    max_fragments = 10000
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.fragments = {}
+
+    @cached_property
+    def plan(self):
+        serializer = self.serializer_class()
+        model = serializer.Meta.model
+        columns = [model._meta.pk.attname]
+        accessors = []
+        many = []
+        for name, field in serializer.fields.items():
+            if isinstance(field, serializers.ListSerializer):
+                m2m = model._meta.get_field(field.source)
+                owner_column = m2m.related_query_name()
+                subfields = [(sub_name, sub_field, sub_field.source) for sub_name, sub_field in field.child.fields.items()]
+                many.append((name, m2m.related_model, owner_column, subfields))
+                accessors.append((name, self.many_accessor(name)))
+            elif isinstance(field, serializers.BaseSerializer):
+                subfields = [(sub_name, sub_field, '%s__%s' % (field.source, sub_field.source))
+                             for sub_name, sub_field in field.fields.items()]
+                columns.extend(column for _, _, column in subfields)
+                accessors.append((name, self.nested_accessor(subfields)))
+            elif isinstance(field, serializers.SlugRelatedField):
+                column = '%s__%s' % (field.source, field.slug_field)
+                columns.append(column)
+                accessors.append((name, self.column_accessor(column)))
+            else:
+                columns.append(field.source)
+                accessors.append((name, self.field_accessor(field, field.source)))
+        return list(dict.fromkeys(columns)), accessors, many
+
+    @staticmethod
+    def column_accessor(column):
+        return lambda row, related: row[column]
+
+    @staticmethod
+    def field_accessor(field, column):
+        to_representation = field.to_representation
+
+        def accessor(row, related):
+            value = row[column]
+            return None if value is None else to_representation(value)
+        return accessor
+
+    def get_fragment(self, subfields, row):
+        """Return representation of nested object, objects with the same values share one JSONFragment."""
+        key = tuple(row[column] for _, _, column in subfields)
+        cache_key = (id(subfields), key)
+        fragment = self.fragments.get(cache_key)
+        if fragment is None:
+            if len(self.fragments) >= self.max_fragments:
+                self.fragments.clear()
+            fragment = self.fragments[cache_key] = JSONFragment(
+                (name, None if value is None else field.to_representation(value))
+                for (name, field, _), value in zip(subfields, key)
+            )
+        return fragment
+
+    def nested_accessor(self, subfields):
+        return lambda row, related: self.get_fragment(subfields, row)
+
+    @staticmethod
+    def many_accessor(name):
+        return lambda row, related: related[name].get(row['id'], [])
+
+    def values(self, queryset):
+        """Return values() queryset with the columns of serializer, e.g. to paginate it."""
+        columns, _, _ = self.plan
+        return queryset.prefetch_related(None).values(*columns)
+
+    def load_many(self, rows):
+        _, _, many = self.plan
+        ids = [row['id'] for row in rows]
+        related = {}
+        for name, related_model, owner_column, subfields in many:
+            objects = related_model.objects.filter(**{owner_column + '__in': ids})
+            grouped = {}
+            for value in objects.values(owner_column, *(column for _, _, column in subfields)):
+                grouped.setdefault(value[owner_column], []).append(self.get_fragment(subfields, value))
+            related[name] = grouped
+        return related
+
+    def serialize(self, rows):
+        """Return list of representations of values() rows."""
+        rows = list(rows)
+        _, accessors, many = self.plan
+        related = self.load_many(rows) if many and rows else {}
+        with measure_serialization():
+            return [OrderedDict((name, accessor(row, related)) for name, accessor in accessors) for row in rows]
+
+
+class TitleStatsSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
+    """Summary row of get_title_stats, null category, genre or year means any value."""
+    category = serializers.CharField(source='category_slug', read_only=True)
+    genre = serializers.CharField(source='genre_slug', read_only=True)
+    year = serializers.SerializerMethodField()
+    rating = serializers.DecimalField(max_digits=4, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = TitleStats
+        fields = ['category', 'genre', 'year', 'titles_count', 'reviews_count', 'rating']
+
+    @staticmethod
+    def get_year(obj):
+        return obj.year or None
+
+
+class TitleStatsQuerySerializer(serializers.Serializer):
+    """Query params of title stats, group_by is a comma separated list of dimensions."""
+    category = serializers.SlugField(required=False)
+    genre = serializers.SlugField(required=False)
+    year = serializers.IntegerField(required=False, min_value=1)
+    group_by = serializers.CharField(required=False)
+
+    def validate_group_by(self, value):
+        dimensions = [item.strip() for item in value.split(',') if item.strip()]
+        unknown = set(dimensions) - set(DIMENSIONS)
+        if unknown:
+            raise serializers.ValidationError('Unknown dimensions: %s, choose from: %s' % (
+                ', '.join(sorted(unknown)), ', '.join(DIMENSIONS)))
+        return dimensions
+
+
+class LeaderboardEntrySerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
+    """Title of leaderboard with its rating and number of reviews within the window of board."""
+    id = serializers.IntegerField(source='title_id', read_only=True)
+    name = serializers.CharField(source='title.name', read_only=True)
+    year = serializers.IntegerField(source='title.year', read_only=True)
+    rating = serializers.DecimalField(max_digits=4, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = ['id', 'name', 'year', 'rating', 'reviews_count']
+
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    """Query params of leaderboard, board of a category or a genre is chosen by its slug."""
+    metric = serializers.ChoiceField(choices=METRICS, default='rating')
+    window = serializers.ChoiceField(choices=WINDOWS, default=0)
+    category = serializers.SlugField(required=False)
+    genre = serializers.SlugField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=TOP_K, default=10)
+
+    def validate(self, attrs):
+        if attrs.get('category') and attrs.get('genre'):
+            raise serializers.ValidationError('Leaderboards are kept per category or per genre, choose one of them.')
+        return attrs
+
+
+class SimilarTitleSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
+    """Similar title with its similarity score."""
+    id = serializers.IntegerField(source='similar_id', read_only=True)
+    name = serializers.CharField(source='similar.name', read_only=True)
+    year = serializers.IntegerField(source='similar.year', read_only=True)
+    rating = serializers.DecimalField(source='similar.rating', max_digits=4, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = SimilarTitle
+        fields = ['id', 'name', 'year', 'rating', 'score']
@@ -0,0 +1,161 @@
+import math
+from collections import defaultdict
+
+from django.db import connection, transaction
+
+from api_board.models import Review, SimilarTitle, SimilarTitleStaging, Title
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    # Index is built in pure Python, which is fine for small databases, see requirements-optional.txt
+    np = sparse = None
+
+# Similar titles stored per title
+NEIGHBORS = 10
+# Number of common reviewers, at which similarity is shrunk by half, so that
+# a couple of common reviewers don't make titles look alike
+SHRINKAGE = 5
+# Reviews per query, titles per matrix product, rows of the index per insert to the staging table
+READ_CHUNK_SIZE = 50000
+TITLES_CHUNK_SIZE = 1000
+INSERT_BATCH_SIZE = 5000
+
+# Rows of titles deleted during the build are skipped
+REPLACE_SQL = (
+    'INSERT INTO {index} (title_id, similar_id, score) '
+    'SELECT title_id, similar_id, score FROM {staging} '
+    'WHERE title_id IN (SELECT id FROM {title}) AND similar_id IN (SELECT id FROM {title})'
+)
+
+
+def iter_review_chunks(chunk_size=READ_CHUNK_SIZE):
+    """Yield lists of (author_id, title_id, score) of all reviews, loaded by keyset chunks in order of id."""
+    queryset = Review.objects.order_by('id').values_list('id', 'author_id', 'title_id', 'score')
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        yield [row[1:] for row in chunk]
+        last_id = chunk[-1][0]
+
+
+def vectorized_neighbors(neighbors=NEIGHBORS, shrinkage=SHRINKAGE, chunk_size=TITLES_CHUNK_SIZE):
+    """Yield (title_id, [(similar_id, score), ...]) computed by sparse matrix products of chunks of titles.
+
+    Reviews are kept as arrays of a few bytes per review, besides them only products of a chunk of titles
+    with all titles are in memory, so memory is bounded by chunk_size.
+    """
+    users, titles, scores = [], [], []
+    for chunk in iter_review_chunks():
+        array = np.array(chunk, dtype=np.int64)
+        users.append(array[:, 0])
+        titles.append(array[:, 1])
+        scores.append(array[:, 2].astype(np.float64))
+    if not users:
+        return
+    user_ids, user_index = np.unique(np.concatenate(users), return_inverse=True)
+    title_ids, title_index = np.unique(np.concatenate(titles), return_inverse=True)
+    scores = np.concatenate(scores)
+    del users, titles
+
+    # Scores relative to the mean score of user, so titles liked by the same users are similar
+    means = np.bincount(user_index, weights=scores) / np.bincount(user_index)
+    shape = (len(user_ids), len(title_ids))
+    ratings = sparse.csr_matrix((scores - means[user_index], (user_index, title_index)), shape=shape)
+    reviewed = sparse.csr_matrix((np.ones_like(scores), (user_index, title_index)), shape=shape)
+    del scores, user_index, title_index
+    ratings_by_title, reviewed_by_title = ratings.T.tocsr(), reviewed.T.tocsr()
+    norms = np.sqrt(np.asarray(ratings_by_title.multiply(ratings_by_title).sum(axis=1)).ravel())
+    inverse_norms = np.divide(1, norms, out=np.zeros_like(norms), where=norms > 0)
+
+    for start in range(0, len(title_ids), chunk_size):
+        stop = min(start + chunk_size, len(title_ids))
+        cosine = (sparse.diags(inverse_norms[start:stop]) @ (ratings_by_title[start:stop] @ ratings)
+                  @ sparse.diags(inverse_norms))
+        weights = (reviewed_by_title[start:stop] @ reviewed).tocsr()
+        weights.data = weights.data / (weights.data + shrinkage)
+        similarity = cosine.multiply(weights).tocsr()
+
+        for row in range(stop - start):
+            begin, end = similarity.indptr[row], similarity.indptr[row + 1]
+            indices, data = similarity.indices[begin:end], similarity.data[begin:end]
+            similar = (data > 0) & (indices != start + row)
+            indices, data = indices[similar], data[similar]
+            order = np.lexsort((title_ids[indices], -data))[:neighbors]
+            yield int(title_ids[start + row]), [(int(title_ids[index]), float(score))
+                                                for index, score in zip(indices[order], data[order])]
+
+
+def python_neighbors(neighbors=NEIGHBORS, shrinkage=SHRINKAGE):
+    """Yield the same neighbours as vectorized_neighbors by loops over reviews of common reviewers."""
+    by_user = defaultdict(list)
+    for chunk in iter_review_chunks():
+        for author_id, title_id, score in chunk:
+            by_user[author_id].append((title_id, score))
+
+    by_title, norms = defaultdict(list), defaultdict(float)
+    for author_id, reviews in by_user.items():
+        mean = sum(score for _, score in reviews) / len(reviews)
+        by_user[author_id] = reviews = [(title_id, score - mean) for title_id, score in reviews]
+        for title_id, value in reviews:
+            by_title[title_id].append((author_id, value))
+            norms[title_id] += value * value
+
+    for title_id in sorted(by_title):
+        dots, common = defaultdict(float), defaultdict(int)
+        for author_id, value in by_title[title_id]:
+            for other_id, other_value in by_user[author_id]:
+                dots[other_id] += value * other_value
+                common[other_id] += 1
+        scored = []
+        for other_id, count in common.items():
+            if other_id == title_id or not norms[title_id] or not norms[other_id]:
+                continue
+            score = dots[other_id] / math.sqrt(norms[title_id] * norms[other_id]) * count / (count + shrinkage)
+            if score > 0:
+                scored.append((-score, other_id))
+        yield title_id, [(other_id, -score) for score, other_id in sorted(scored)[:neighbors]]
+
+
+def stage_similar_titles(neighbors_of_titles):
+    """Write neighbours of titles to the staging table by batches, return number of titles, which have them."""
+    SimilarTitleStaging.objects.all().delete()
+    rows, count = [], 0
+    for title_id, similar in neighbors_of_titles:
+        rows.extend(SimilarTitleStaging(title_id=title_id, similar_id=similar_id, score=score)
+                    for similar_id, score in similar)
+        count += bool(similar)
+        if len(rows) >= INSERT_BATCH_SIZE:
+            SimilarTitleStaging.objects.bulk_create(rows)
+            rows = []
+    SimilarTitleStaging.objects.bulk_create(rows)
+    return count
+
+
+def build_similar_titles(neighbors=NEIGHBORS, shrinkage=SHRINKAGE, chunk_size=TITLES_CHUNK_SIZE, vectorized=None):
+    """Replace the index of similar titles, return number of titles, which have similar ones.
+
+    Similarity is the cosine of scores of common reviewers relative to their mean scores, shrunk by
+    the number of common reviewers. It's computed by NumPy and SciPy, if they are installed.
+    Rows of the index are written to the staging table by batches and copied to the index by one query.
+    """
+    if vectorized is None:
+        vectorized = np is not None
+    if vectorized:
+        neighbors_of_titles = vectorized_neighbors(neighbors, shrinkage, chunk_size)
+    else:
+        neighbors_of_titles = python_neighbors(neighbors, shrinkage)
+
+    # Index is staged before the transaction, so writes of reviews aren't blocked by the build
+    count = stage_similar_titles(neighbors_of_titles)
+    sql = REPLACE_SQL.format(**{name: connection.ops.quote_name(model._meta.db_table) for name, model in
+                                (('index', SimilarTitle), ('staging', SimilarTitleStaging), ('title', Title))})
+    with transaction.atomic():
+        SimilarTitle.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+    SimilarTitleStaging.objects.all().delete()
+    return count
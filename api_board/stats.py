@@ -0,0 +1,160 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import reduce
+from itertools import product
+from operator import or_
+
+from django.db.models import Count, ExpressionWrapper, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, \
+    Value
+from django.db.models.functions import Cast, NullIf
+
+from api_board.models import Category, Genre, Title, TitleStats
+
+# Value of category_id, genre_id and year of summary rows counting titles with any value
+ANY = 0
+DIMENSIONS = ('category', 'genre', 'year')
+# Keys per UPDATE, so the WHERE clause stays within limits of expression depth
+KEYS_PER_QUERY = 100
+NO_CHANGE = (0, 0, 0)
+
+
+def title_keys(category_id, genre_ids, year):
+    """Return keys (category_id, genre_id, year) of the summary rows, which count the title."""
+    return product((category_id, ANY), (*genre_ids, ANY), (year, ANY))
+
+
+def collect_title_stats(**lookups):
+    """Return sums (titles, reviews, score) of titles found by lookups per key of summary row.
+
+    Titles with their genres are read by one query, lookups mustn't filter by genre,
+    since the join of genres is shared with the filter.
+    """
+    rows = (Title.objects.filter(**lookups).order_by()
+            .values_list('id', 'category_id', 'year', 'reviews_count', 'score_sum', 'genre'))
+    titles = {}
+    for title_id, category_id, year, reviews, score, genre_id in rows:
+        title = titles.setdefault(title_id, (category_id, [], year, reviews, score))
+        if genre_id is not None:
+            title[1].append(genre_id)
+
+    sums = defaultdict(lambda: [0, 0, 0])
+    for category_id, genre_ids, year, reviews, score in titles.values():
+        for key in title_keys(category_id, genre_ids, year):
+            key_sums = sums[key]
+            key_sums[0] += 1
+            key_sums[1] += reviews
+            key_sums[2] += score
+    return sums
+
+
+def keys_filter(keys):
+    return reduce(or_, (Q(category_id=category_id, genre_id=genre_id, year=year)
+                        for category_id, genre_id, year in keys))
+
+
+def apply_title_stats(changes):
+    """Add changes (titles, reviews, score) to summary rows of their keys.
+
+    Rows with the same change are updated by one UPDATE with F-expressions, so concurrent writes
+    don't overwrite each other. Missing rows are inserted before the increase, the insert skips rows
+    inserted in the meantime.
+    """
+    keys_by_change = defaultdict(list)
+    for key, change in changes.items():
+        if tuple(change) != NO_CHANGE:
+            keys_by_change[tuple(change)].append(key)
+
+    for (titles, reviews, score), keys in keys_by_change.items():
+        for start in range(0, len(keys), KEYS_PER_QUERY):
+            batch = keys[start:start + KEYS_PER_QUERY]
+            if titles > 0 or reviews > 0:
+                TitleStats.objects.bulk_create([TitleStats(category_id=category_id, genre_id=genre_id, year=year)
+                                                for category_id, genre_id, year in batch],
+                                               ignore_conflicts=True)
+            TitleStats.objects.filter(keys_filter(batch)).update(titles_count=F('titles_count') + titles,
+                                                                 reviews_count=F('reviews_count') + reviews,
+                                                                 score_sum=F('score_sum') + score)
+
+
+def add_title_stats(**lookups):
+    """Count new titles found by lookups in summary rows."""
+    apply_title_stats(collect_title_stats(**lookups))
+
+
+@contextmanager
+def track_title_stats(**lookups):
+    """Move titles found by lookups between summary rows according to changes made within the block.
+
+    Titles, which are deleted within the block, are removed from their rows. Rows of titles are locked
+    till the end of transaction, so reviews written in the meantime aren't counted by both snapshots,
+    review writes lock the title by update of its rating.
+    """
+    list(Title.objects.filter(**lookups).order_by('id').select_for_update().values_list('id', flat=True))
+    before = collect_title_stats(**lookups)
+    yield
+    after = collect_title_stats(**lookups)
+    apply_title_stats({key: [new - old for new, old in zip(after.get(key, NO_CHANGE), before.get(key, NO_CHANGE))]
+                       for key in {*before, *after}})
+
+
+def add_review_stats(title_id, score_delta, count_delta):
+    """Apply a change of reviews of title to its summary rows, see update_title_rating."""
+    apply_title_stats({key: (0, count_delta, score_delta) for key in collect_title_stats(id=title_id)})
+
+
+def rebuild_title_stats():
+    """Recalculate all summary rows from titles and reviews, return number of rows.
+
+    Sums are grouped by the database, once per combination of dimensions,
+    genres are counted from the table of relation of titles and genres.
+    """
+    TitleStats.objects.all().delete()
+    any_value = Value(ANY, output_field=IntegerField())
+    rows = []
+    for dimensions in product((True, False), repeat=len(DIMENSIONS)):
+        by_category, by_genre, by_year = dimensions
+        if by_genre:
+            queryset = Title.genre.through.objects.values_list(
+                'title__category_id' if by_category else any_value,
+                'genre_id',
+                'title__year' if by_year else any_value,
+            ).annotate(titles=Count('title_id'), reviews=Sum('title__reviews_count'), score=Sum('title__score_sum'))
+        else:
+            queryset = Title.objects.values_list(
+                'category_id' if by_category else any_value,
+                any_value,
+                'year' if by_year else any_value,
+            ).annotate(titles=Count('id'), reviews=Sum('reviews_count'), score=Sum('score_sum'))
+        rows.extend(TitleStats(category_id=category_id, genre_id=genre_id, year=year, titles_count=titles,
+                               reviews_count=reviews, score_sum=score)
+                    for category_id, genre_id, year, titles, reviews, score in queryset.order_by())
+    TitleStats.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def get_title_stats(category=None, genre=None, year=None, group_by=()):
+    """Return summary rows of titles with category slug, genre slug and year, all titles if they aren't given.
+
+    Dimensions of group_by, which aren't given, get a row per value, other ones are taken as any value.
+    Rows are read from the unique index of keys, rows are annotated by slugs and average score.
+    """
+    lookups = {}
+    for name, value in (('category_id', category and Subquery(Category.objects.filter(slug=category).values('id'))),
+                        ('genre_id', genre and Subquery(Genre.objects.filter(slug=genre).values('id'))),
+                        ('year', year)):
+        if value:
+            lookups[name] = value
+        elif name.replace('_id', '') in group_by:
+            lookups[name + '__gt'] = ANY
+        else:
+            lookups[name] = ANY
+
+    queryset = TitleStats.objects.filter(**lookups)
+    if group_by:
+        queryset = queryset.filter(titles_count__gt=0)
+    return queryset.annotate(
+        category_slug=Subquery(Category.objects.filter(id=OuterRef('category_id')).values('slug')),
+        genre_slug=Subquery(Genre.objects.filter(id=OuterRef('genre_id')).values('slug')),
+        rating=ExpressionWrapper(Cast('score_sum', FloatField()) / NullIf('reviews_count', Value(0)),
+                                 output_field=FloatField()),
+    )
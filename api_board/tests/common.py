@@ -1,7 +1,11 @@
+from contextlib import contextmanager
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
-from rest_framework_simplejwt.tokens import RefreshToken
+
+from api_board.authentication import ClaimsRefreshToken
 
 
 def create_clients_for_users():
@@ -14,11 +18,11 @@ def create_clients_for_users():
     moderator = get_user_model().objects.get(username='moderator', role='moderator')
     admin = get_user_model().objects.get(username='admin', role='admin')
 
-    user_token = RefreshToken.for_user(user)
+    user_token = ClaimsRefreshToken.for_user(user)
     user_client = APIClient()
-    moderator_token = RefreshToken.for_user(moderator)
+    moderator_token = ClaimsRefreshToken.for_user(moderator)
     moderator_client = APIClient()
-    admin_token = RefreshToken.for_user(admin)
+    admin_token = ClaimsRefreshToken.for_user(admin)
     admin_client = APIClient()
 
     user_client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(user_token.access_token))
@@ -41,7 +45,20 @@ def get_user_from_client(client):
 def create_client_for_user():
     """Create user with role=user, return client for it."""
     other_user = get_user_model().objects.create(username='other_user', email='mail@mail.com')
-    token = RefreshToken.for_user(other_user)
+    token = ClaimsRefreshToken.for_user(other_user)
     client = APIClient()
     client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(token.access_token))
     return client
+
+
+@contextmanager
+def run_on_commit_callbacks():
+    """Collect callbacks of transaction.on_commit() within the block and run them at its end as after commit.
+
+    Transaction of TestCase is never committed, so its callbacks aren't run otherwise.
+    """
+    callbacks = []
+    with mock.patch('django.db.transaction.on_commit', side_effect=callbacks.append):
+        yield callbacks
+    for callback in callbacks:
+        callback()
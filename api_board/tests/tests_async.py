@@ -0,0 +1,119 @@
+import asyncio
+import re
+from pathlib import Path
+from types import ModuleType
+
+from asgiref.sync import sync_to_async
+from django.core.asgi import get_asgi_application
+from django.test import TransactionTestCase, override_settings
+from django.urls import include, path
+from rest_framework.reverse import reverse
+
+from api_board.async_views import offload_routes
+from api_board.models import Title
+from api_board.tests.common import create_clients_for_users
+from api_board.urls import route
+
+# Url configuration of ASGI deployment, where read-heavy routes are served by async views
+async_urlconf = ModuleType('async_urlconf')
+async_urlconf.urlpatterns = [path('api/v1/', include(offload_routes(route.urls)))]
+
+
+@override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
+class TestAsyncReadViews(TransactionTestCase):
+    # Async views query the database from other threads, so data is committed
+    fixtures = ['genres', 'categories', 'titles', 'users', 'reviews', 'comments']
+
+    def test_offloaded_routes(self):
+        views = {pattern.name: pattern.callback for pattern in offload_routes(route.urls)}
+        for name in ['title-list', 'title-detail', 'review-list', 'comment-list']:
+            self.assertTrue(asyncio.iscoroutinefunction(views[name]), name)
+        for name in ['review-detail', 'title-bulk', 'category-list']:
+            self.assertFalse(asyncio.iscoroutinefunction(views[name]), name)
+
+    async def test_async_views_output(self):
+        urls = [
+            reverse('title-list'),
+            reverse('title-detail', kwargs={'pk': 1}),
+            reverse('review-list', kwargs={'title_id': 1}),
+            reverse('comment-list', kwargs={'title_id': 1, 'review_id': 1}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                expected = await self.async_client.get(url)
+                with override_settings(ROOT_URLCONF=async_urlconf):
+                    response = await self.async_client.get(url)
+                    self.assertTrue(asyncio.iscoroutinefunction(response.resolver_match.func))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, expected.content)
+                self.assertIn('desc="', response['Server-Timing'])
+
+    async def test_async_query_count(self):
+        urls = [
+            reverse('title-detail', kwargs={'pk': 1}),
+            reverse('review-detail', kwargs={'title_id': 1, 'pk': 1}),
+            reverse('title-top'),
+            reverse('title-stats'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                expected = await sync_to_async(self.client.get)(url)
+                with override_settings(ROOT_URLCONF=async_urlconf):
+                    response = await self.async_client.get(url)
+                queries = self.get_query_count(response)
+                self.assertGreater(queries, 0)
+                self.assertEqual(queries, self.get_query_count(expected))
+
+    @staticmethod
+    def get_query_count(response):
+        timings = dict(item.split(';', 1) for item in response['Server-Timing'].split(', '))
+        return int(re.search(r'desc="(\d+) queries"', timings['db']).group(1))
+
+    async def test_async_view_not_found(self):
+        with override_settings(ROOT_URLCONF=async_urlconf):
+            response = await self.async_client.get(reverse('review-list', kwargs={'title_id': 100}))
+        self.assertEqual(response.status_code, 404)
+
+
+async def asgi_get(application, url, headers=()):
+    """Send GET request to ASGI application as a server does, return status, headers and body of the response."""
+    path, _, query = url.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(name.encode(), value.encode()) for name, value in headers],
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    start = messages[0]
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return start['status'], dict((name.decode(), value.decode()) for name, value in start['headers']), body
+
+
+@override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
+class TestExportASGI(TransactionTestCase):
+    # ASGI handler runs the view in another thread, so data is committed
+    fixtures = ['genres', 'categories', 'titles', 'users']
+
+    async def test_export_titles(self):
+        _, _, admin_client = await sync_to_async(create_clients_for_users)()
+        headers = [('authorization', admin_client._credentials['HTTP_AUTHORIZATION'])]
+        count = await sync_to_async(Title.objects.count)()
+        for output, lines in [('ndjson', count), ('csv', count + 1)]:
+            with self.subTest(output=output):
+                status, response_headers, body = await asgi_get(
+                    get_asgi_application(), reverse('title-export') + '?output=' + output, headers,
+                )
+                self.assertEqual(status, 200)
+                self.assertEqual(response_headers['Content-Length'], str(len(body)))
+                self.assertIn('filename="titles.%s"' % output, response_headers['Content-Disposition'])
+                self.assertEqual(len(body.decode().splitlines()), lines)
+
@@ -1,7 +1,20 @@
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
 from django.core import mail
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from rest_framework import status
 from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api_board.authentication import StatelessJWTAuthentication
+from api_board.functions import generate_username
+from api_board.models import Review, User
+from api_board.tests.common import create_clients_for_users
 
 
 class TestAuth(TestCase):
@@ -9,6 +22,8 @@ class TestAuth(TestCase):
 
     def test_sending_email(self):
         self.client.post(self.url, data={"email": "testded@mail.ru"}, format='json')
+        self.assertEqual(len(mail.outbox), 0, msg="Email is sent during request instead of worker")
+        call_command('send_queued_email', stdout=StringIO())
         email = mail.outbox
         self.assertEqual(len(email), 1, msg="Email doesn't send after registration")
         self.assertIn('confirmation code', email[0].body, msg="Email body doesn't contains str:confirmation code")
@@ -19,6 +34,25 @@ class TestAuth(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIsNotNone(response.data.get('username'))
 
+    def test_generating_taken_username(self):
+        User.objects.bulk_create([User(username=username, email='%s@gmail.com' % username)
+                                  for username in ['john', 'john1', 'john9', 'johnny']])
+        with self.assertNumQueries(1):
+            self.assertEqual(generate_username(User, 'john@mail.ru'), 'john10')
+        self.assertEqual(generate_username(User, 'johnny@mail.ru'), 'johnny1')
+        self.assertEqual(generate_username(User, 'mary@mail.ru'), 'mary')
+
+        response = self.client.post(self.url, data={"email": "john@mail.ru"}, format='json')
+        self.assertEqual(response.data['username'], 'john10')
+
+    def test_generating_username_taken_with_leading_zeros(self):
+        User.objects.bulk_create([User(username=username, email='%s@gmail.com' % username)
+                                  for username in ['john', 'john007', 'john8']])
+        self.assertEqual(generate_username(User, 'john@mail.ru'), 'john9')
+        response = self.client.post(self.url, data={"email": "john@mail.ru"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['username'], 'john9')
+
     def test_invalid_email(self):
         invalid_email = 'invalid'
         self.url = reverse('get-confirmation_code')
@@ -29,6 +63,7 @@ class TestAuth(TestCase):
     def test_get_token(self):
         data = {"email": "testded@mail.ru"}
         self.client.post(self.url, data=data, format='json')
+        call_command('send_queued_email', stdout=StringIO())
 
         email = mail.outbox[0]
         confirmation_code = email.body.split('confirmation code')
@@ -38,6 +73,62 @@ class TestAuth(TestCase):
         self.assertIn('token', response.data)
         self.assertIsInstance(response.data['token'], str)
 
+        # Claims for permission checks without query of user
+        token = AccessToken(response.data['token'])
+        self.assertEqual(token['username'], 'testded')
+        self.assertEqual(token['role'], 'user')
+        self.assertFalse(token['is_superuser'])
+
         # Confirmation code works one time
         response = self.client.post(url, data=data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
+@mock.patch.object(APIView, 'authentication_classes', [StatelessJWTAuthentication])
+class TestStatelessJWTAuthentication(TestCase):
+    fixtures = ['genres', 'categories', 'titles', 'users', 'reviews']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_client, cls.moderator_client, cls.admin_client = create_clients_for_users()
+        super().setUpTestData()
+
+    def test_admin_permission_without_user_query(self):
+        # count and page of users
+        with self.assertNumQueries(2):
+            response = self.admin_client.get(reverse('user-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response = self.user_client.get(reverse('user-list'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_object_permission_of_author(self):
+        review = Review.objects.exclude(author__username='user').first()
+        url = reverse('review-detail', kwargs={'title_id': review.title_id, 'pk': review.pk})
+        response = self.user_client.patch(url, data={'text': 'Updated review'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.moderator_client.patch(url, data={'text': 'Updated review'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_model_loaded_when_needed(self):
+        url = reverse('review-list', kwargs={'title_id': 2})
+        response = self.user_client.post(url, data={'text': 'Some text', 'score': 5})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['author'], 'user')
+
+        response = self.user_client.get(reverse('user-me'))
+        self.assertEqual(response.data['email'], 'user@gmail.com')
+
+    def test_changed_user_in_response(self):
+        response = self.user_client.patch(reverse('user-me'), data={'username': 'renamed'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['username'], 'renamed')
+
+    def test_token_without_claims(self):
+        client = APIClient()
+        token = AccessToken.for_user(Review.objects.first().author)
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(token))
+        response = client.get(reverse('user-me'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,41 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+
+from api_board.models import Category, Title, Review, Comment
+
+
+class TestBenchmark(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = Path(directory.name) / 'benchmark.json'
+
+    def test_generate_data_and_benchmark(self):
+        call_command('generate_data', titles=20, reviews=50, comments=60, batch_size=15, stdout=StringIO())
+        self.assertEqual(Title.objects.count(), 20)
+        self.assertEqual(Review.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 60)
+        self.assertEqual(Title.objects.filter(rating__isnull=True).count(), 0)
+
+        call_command('benchmark_api', requests=3, warmup=0, output=self.output,
+                     endpoints=['title-list', 'comment-detail'], stdout=StringIO())
+        report = json.loads(self.output.read_text())
+        self.assertEqual(report['dataset']['title'], 20)
+        self.assertEqual(set(report['results']), {'title-list', 'comment-detail'})
+        self.assertEqual(report['results']['title-list']['requests'], 3)
+        self.assertEqual(report['results']['title-list']['queries'], 3)
+
+    def test_generate_data_on_non_empty_database(self):
+        Category.objects.create(name='Films', slug='films')
+        with self.assertRaises(CommandError):
+            call_command('generate_data', titles=2, reviews=2, comments=0, stdout=StringIO())
+        self.assertFalse(Title.objects.exists())
+
+    def test_generate_data_with_too_few_users(self):
+        with self.assertRaises(CommandError):
+            call_command('generate_data', titles=2, reviews=10, users=3, stdout=StringIO())
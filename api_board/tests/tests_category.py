@@ -1,13 +1,16 @@
 from pathlib import Path
+from unittest import mock
 
 from django.core import exceptions
+from django.core.cache import cache
 from django.test import TestCase, override_settings
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 
 from api_board.models import Category
-from api_board.tests.common import create_clients_for_users
+from api_board.views import CategoryViewSet
+from api_board.tests.common import create_clients_for_users, run_on_commit_callbacks
 
 
 @override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
@@ -27,6 +30,9 @@ class TestCategory(TestCase):
 
         super().setUpTestData()
 
+    def setUp(self):
+        cache.clear()
+
     def test_get_category_list_for_not_auth_user(self):
         response = self.not_auth_client.get(self.list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -43,12 +49,48 @@ class TestCategory(TestCase):
         data = response.data['results'][-1]
         self.assertEqual(data['slug'], self.data['slug'])
 
+    def test_get_category_list_is_cached(self):
+        self.not_auth_client.get(self.list_url)
+        with self.assertNumQueries(0):
+            response = self.not_auth_client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get('count'), Category.objects.count())
+
+    def test_category_list_cache_timeout(self):
+        view = CategoryViewSet()
+        self.assertEqual(view.get_list_cache_timeout(), view.list_cache_local_timeout)
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            self.assertEqual(view.get_list_cache_timeout(), view.list_cache_timeout)
+
+    def test_get_category_list_cache_invalidated_on_delete(self):
+        self.not_auth_client.get(self.list_url)
+        with run_on_commit_callbacks():
+            self.admin_client.delete(self.detail_url)
+            # Cached page is served till commit, a page cached before commit would keep the deleted row
+            response = self.not_auth_client.get(self.list_url)
+            self.assertIn(self.slug, [obj['slug'] for obj in response.data['results']])
+        response = self.not_auth_client.get(self.list_url)
+        self.assertNotIn(self.slug, [obj['slug'] for obj in response.data['results']])
+
     def test_create_category_without_slug(self):
         response = self.admin_client.post(self.list_url, data={"name": "horror"})
         category = Category.objects.last()
         self.assertEqual(response.data['slug'], category.slug)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_create_category_with_taken_slug(self):
+        for i, expected in enumerate(['western', 'western-1', 'western-2']):
+            response = self.admin_client.post(self.list_url, data={'name': 'Western %d' % i, 'slug': 'western'})
+            self.assertEqual(response.data['slug'], expected)
+
+    def test_create_category_slug_taken_concurrently(self):
+        Category.objects.create(name='Western', slug='western')
+        # The first generated slug is taken by a concurrent request before the insert
+        with mock.patch('api_board.serializers.generate_slug', side_effect=['western', 'western-1']):
+            response = self.admin_client.post(self.list_url, data={'name': 'Western 2'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['slug'], 'western-1')
+
     def test_create_category_by_auth_user(self):
         response = self.user_client.post(self.list_url, self.data)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,11 +1,17 @@
+from io import StringIO
 from pathlib import Path
+from unittest import mock
 
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 
-from api_board.models import Comment
+from api_board.models import Comment, Review
+from api_board.views import CommentViewSet, ReviewViewSet
 from api_board.tests.common import create_clients_for_users, get_user_from_client, create_client_for_user
 
 
@@ -25,6 +31,7 @@ class TestComment(TestCase):
 
     @classmethod
     def setUpTestData(cls):
+        call_command('rebuild_ratings', stdout=StringIO())
         cls.user_client, cls.moderator_client, cls.admin_client = create_clients_for_users()
         cls.not_auth_client = APIClient()
         super().setUpTestData()
@@ -35,6 +42,32 @@ class TestComment(TestCase):
         self.assertIn('results', response.data)
         self.assertIn('next', response.data)
 
+    def test_comment_list_count_from_counter(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.not_auth_client.get(self.list_url)
+        self.assertEqual(response.data['count'], 2)
+        self.assertFalse([query for query in queries.captured_queries if 'COUNT(' in query['sql']])
+
+        response = self.user_client.post(self.list_url, data=self.data)
+        review_url = reverse('review-detail', kwargs={'title_id': self.title_id, 'pk': self.review_id})
+        self.assertEqual(self.not_auth_client.get(self.list_url).data['count'], 3)
+        self.assertEqual(self.not_auth_client.get(review_url).data['comments_count'], 3)
+
+        url = reverse('comment-detail', kwargs={'title_id': self.title_id, 'review_id': self.review_id,
+                                                'pk': response.data['id']})
+        self.user_client.delete(url)
+        self.assertEqual(self.not_auth_client.get(self.list_url).data['count'], 2)
+        self.assertEqual(self.not_auth_client.get(review_url).data['comments_count'], 2)
+
+    def test_update_review_keeps_concurrent_comments_count(self):
+        stale = Review.objects.get(id=self.review_id)
+        self.user_client.post(self.list_url, data=self.data)
+        review_url = reverse('review-detail', kwargs={'title_id': self.title_id, 'pk': self.review_id})
+        with mock.patch.object(ReviewViewSet, 'get_object', return_value=stale):
+            response = self.admin_client.patch(review_url, data={'text': 'Updated review'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Review.objects.get(id=self.review_id).comments_count, 3)
+
     def test_comment_list_response_data(self):
         response = self.not_auth_client.get(self.list_url)
         data = response.json()['results'][0]
@@ -42,6 +75,12 @@ class TestComment(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.check_response_data(data, comment)
 
+    def test_comment_list_fast_path_output(self):
+        response = self.not_auth_client.get(self.list_url)
+        with mock.patch.object(CommentViewSet, 'fast_list_serializer', None):
+            expected = self.not_auth_client.get(self.list_url)
+        self.assertEqual(response.content, expected.content)
+
     def check_response_data(self, data, comment):
         self.assertEqual(data['id'], comment.id)
         self.assertEqual(data['author'], comment.author.username)
@@ -62,6 +101,20 @@ class TestComment(TestCase):
         comment = Comment.objects.last()
         self.check_response_data(response.data, comment)
 
+    def test_create_comment_number_of_queries(self):
+        # user of token, savepoint, review with its title, insert, counter of review, release
+        with self.assertNumQueries(6):
+            response = self.user_client.post(self.list_url, data=self.data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_comment_list_review_of_other_title(self):
+        url = reverse('comment-list', kwargs={'title_id': 2,
+                                              'review_id': self.review_id})
+        response = self.not_auth_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.user_client.post(url, data=self.data)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_create_comment_invalid_data(self):
         data = {}
         response = self.user_client.post(self.list_url, data=data)
@@ -78,6 +131,16 @@ class TestComment(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.check_response_data(response.data, comment)
 
+    def test_comment_list_not_modified(self):
+        response = self.not_auth_client.get(self.list_url)
+        etag = response['ETag']
+        response = self.not_auth_client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.user_client.post(self.list_url, data=self.data)
+        response = self.not_auth_client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_get_comment_invalid_path(self):
         detail_url = reverse('comment-detail', kwargs={'title_id': self.title_id,
                                                        'review_id': self.review_id,
@@ -1,13 +1,14 @@
 from pathlib import Path
 
 from django.core import exceptions
+from django.core.cache import cache
 from django.test import TestCase, override_settings
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 
 from api_board.models import Genre
-from api_board.tests.common import create_clients_for_users
+from api_board.tests.common import create_clients_for_users, run_on_commit_callbacks
 
 
 @override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
@@ -26,6 +27,9 @@ class TestGenre(TestCase):
 
         super().setUpTestData()
 
+    def setUp(self):
+        cache.clear()
+
     def test_get_genre_list_for_not_auth_user(self):
         response = self.not_auth_client.get(self.list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -46,6 +50,23 @@ class TestGenre(TestCase):
         self.assertEqual(data['name'], self.data['name'])
         self.assertEqual(data['slug'], self.data['slug'])
 
+    def test_get_genre_list_is_cached(self):
+        self.not_auth_client.get(self.list_url)
+        with self.assertNumQueries(0):
+            response = self.not_auth_client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get('count'), Genre.objects.count())
+
+    def test_get_genre_list_cache_invalidated_on_delete(self):
+        self.not_auth_client.get(self.list_url)
+        with run_on_commit_callbacks():
+            self.admin_client.delete(self.detail_url)
+            # Cached page is served till commit, a page cached before commit would keep the deleted row
+            response = self.not_auth_client.get(self.list_url)
+            self.assertIn(self.slug, [obj['slug'] for obj in response.data['results']])
+        response = self.not_auth_client.get(self.list_url)
+        self.assertNotIn(self.slug, [obj['slug'] for obj in response.data['results']])
+
     def test_create_genre_without_slug(self):
         response = self.admin_client.post(self.list_url, data={"name": "horror"})
         genre = Genre.objects.last()
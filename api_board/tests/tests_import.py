@@ -0,0 +1,50 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command, CommandError
+from django.test import TestCase, override_settings
+
+from api_board.models import Title, Review
+
+
+@override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
+class TestImportData(TestCase):
+    fixtures = ['genres', 'categories', 'users']
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def import_data(self, kind, name, content, **options):
+        path = self.directory / name
+        path.write_text(content)
+        call_command('import_data', kind, path, stdout=StringIO(), **options)
+
+    def test_import_titles_and_reviews(self):
+        self.import_data('titles', 'titles.csv',
+                         'id,name,year,description,category\n'
+                         '10,Alien,1979,,film\n'
+                         '11,Dune,1965,Novel,book\n', batch_size=1)
+        self.import_data('genre_titles', 'links.csv', 'title,genre\n10,comedy\n')
+        reviews = [
+            {'id': 1, 'title': 10, 'author': 'user', 'text': 'Scary', 'score': 8, 'pub_date': '2021-02-11T15:13:25Z'},
+            {'id': 2, 'title': 10, 'author': 'admin', 'text': 'Good', 'score': 6},
+        ]
+        self.import_data('reviews', 'reviews.jsonl', '\n'.join(json.dumps(review) for review in reviews))
+
+        self.assertEqual(list(Title.objects.values_list('name', 'category__slug')),
+                         [('Alien', 'film'), ('Dune', 'book')])
+        self.assertEqual(list(Title.objects.get(id=10).genre.values_list('slug', flat=True)), ['comedy'])
+        self.assertEqual(Review.objects.get(id=1).pub_date.year, 2021)
+        title = Title.objects.get(id=10)
+        self.assertEqual((title.score_sum, title.reviews_count), (14, 2))
+
+    def test_import_unknown_slug(self):
+        with self.assertRaisesMessage(CommandError, 'Row 2'):
+            self.import_data('titles', 'titles.csv',
+                             'name,year,category\n'
+                             'Alien,1979,film\n'
+                             'Dune,1965,unknown\n')
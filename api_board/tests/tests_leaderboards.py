@@ -0,0 +1,125 @@
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api_board.leaderboards import make_entries, refresh_leaderboards
+from api_board.models import LeaderboardEntry
+from api_board.tests.common import create_clients_for_users
+
+
+@override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
+class TestLeaderboards(TestCase):
+    fixtures = ['genres', 'categories', 'titles', 'users', 'reviews']
+    url = reverse('title-top')
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('rebuild_ratings', stdout=StringIO())
+        call_command('refresh_leaderboards', stdout=StringIO())
+        cls.user_client, cls.moderator_client, cls.admin_client = create_clients_for_users()
+        cls.not_auth_client = APIClient()
+        super().setUpTestData()
+
+    def get_top(self, **params):
+        response = self.not_auth_client.get(self.url, data=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(row['id'], row['rating'], row['reviews_count']) for row in response.data]
+
+    def post_review(self, client, title_id, score):
+        url = reverse('review-list', kwargs={'title_id': title_id})
+        response = client.post(url, data={'text': 'Review', 'score': score})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def assertLeaderboardsRefreshed(self):
+        """Leaderboards maintained by writes are the same as the recomputed ones."""
+        fields = ('metric', 'window', 'category_id', 'genre_id', 'title_id', 'value', 'reviews_count')
+        maintained = set(LeaderboardEntry.objects.values_list(*fields))
+        refresh_leaderboards()
+        self.assertEqual(maintained, set(LeaderboardEntry.objects.values_list(*fields)))
+
+    def test_all_time_top(self):
+        with self.assertNumQueries(1):
+            response = self.not_auth_client.get(self.url)
+        self.assertEqual(response.data, [
+            {'id': 1, 'name': 'Home alone', 'year': 1990, 'rating': '9.50', 'reviews_count': 2},
+        ])
+        self.assertEqual(self.get_top(metric='velocity', genre='family'), [(1, '9.50', 2)])
+        self.assertEqual(self.get_top(category='book'), [])
+        # Reviews of fixtures are older than windows
+        self.assertEqual(self.get_top(window=30), [])
+
+    def test_invalid_params(self):
+        response = self.not_auth_client.get(self.url, data={'category': 'film', 'genre': 'comedy'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.not_auth_client.get(self.url, data={'window': 3})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_leaderboards_follow_review_writes(self):
+        review_id = self.post_review(self.user_client, 3, 10)
+        self.assertEqual(self.get_top(), [(3, '10.00', 1), (1, '9.50', 2)])
+        self.assertEqual(self.get_top(window=7, category='film'), [(3, '10.00', 1)])
+        self.assertEqual(self.get_top(metric='velocity'), [(1, '9.50', 2), (3, '10.00', 1)])
+        self.assertLeaderboardsRefreshed()
+
+        url = reverse('review-detail', kwargs={'title_id': 3, 'pk': review_id})
+        self.user_client.patch(url, data={'score': 2})
+        self.assertEqual(self.get_top(), [(1, '9.50', 2), (3, '2.00', 1)])
+        self.assertLeaderboardsRefreshed()
+
+        self.user_client.delete(url)
+        self.assertEqual(self.get_top(window=7), [])
+        self.assertLeaderboardsRefreshed()
+
+    def test_leaderboards_follow_title_writes(self):
+        url = reverse('title-detail', kwargs={'pk': 1})
+        response = self.admin_client.patch(url, data={'category': 'book', 'genre': ['historical']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_top(category='film'), [])
+        self.assertEqual(self.get_top(genre='historical'), [(1, '9.50', 2)])
+        self.assertLeaderboardsRefreshed()
+
+        self.admin_client.delete(reverse('genre-detail', kwargs={'slug': 'historical'}))
+        self.assertFalse(LeaderboardEntry.objects.filter(genre_id=2).exists())
+        self.admin_client.delete(url)
+        self.assertEqual(self.get_top(), [])
+
+    @mock.patch('api_board.leaderboards.CAPACITY', 1)
+    def test_full_board_keeps_top_titles(self):
+        refresh_leaderboards()
+        self.post_review(self.user_client, 3, 10)
+        self.assertEqual(self.get_top(), [(3, '10.00', 1)])
+        self.post_review(self.user_client, 2, 5)
+        self.assertEqual(self.get_top(), [(3, '10.00', 1)])
+        self.assertEqual(self.get_top(category='book'), [(2, '5.00', 1)])
+        self.assertLeaderboardsRefreshed()
+
+
+@override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
+class TestLeaderboardsRefreshTransactions(TransactionTestCase):
+    # Transactions of boards are committed, so the refresh doesn't run inside a transaction of the test
+    fixtures = ['genres', 'categories', 'titles', 'users', 'reviews']
+
+    def test_boards_replaced_in_own_transactions(self):
+        call_command('rebuild_ratings', stdout=StringIO())
+        calls = []
+
+        def fail_on_second_board(reviews, score):
+            # Reviews of fixtures are of one title, so every board has a single row
+            calls.append(reviews)
+            if len(calls) > 1:
+                raise RuntimeError('Refresh stopped')
+            return make_entries(reviews, score)
+
+        with mock.patch('api_board.leaderboards.make_entries', fail_on_second_board):
+            with self.assertRaises(RuntimeError):
+                call_command('refresh_leaderboards', stdout=StringIO())
+        # The first board is kept, when the refresh fails on the next one
+        self.assertTrue(LeaderboardEntry.objects.exists())
+
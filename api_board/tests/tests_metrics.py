@@ -0,0 +1,68 @@
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api_board.metrics import MetricsRegistry, RequestMetrics, registry
+from api_board.tests.common import create_clients_for_users
+
+
+@override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
+class TestRequestMetrics(TestCase):
+    fixtures = ['genres', 'categories', 'titles', 'users', 'reviews']
+    metrics_url = reverse('request-metrics')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_client, cls.moderator_client, cls.admin_client = create_clients_for_users()
+        cls.not_auth_client = APIClient()
+        super().setUpTestData()
+
+    def setUp(self):
+        registry.reset()
+
+    def test_server_timing_header(self):
+        response = self.not_auth_client.get(reverse('title-list'))
+        timings = dict(item.split(';', 1) for item in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timings), {'db', 'serialize', 'render', 'total'})
+        # validators with count, titles with categories, genres of the page
+        self.assertIn('desc="3 queries"', timings['db'])
+
+    def test_stats_per_route(self):
+        self.not_auth_client.get(reverse('title-list'))
+        self.not_auth_client.get(reverse('title-list'))
+        self.not_auth_client.get(reverse('review-detail', kwargs={'title_id': 1, 'pk': 1}))
+
+        response = self.admin_client.get(self.metrics_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = {item['route']: item for item in response.data}
+        self.assertEqual(stats['title-list']['requests'], 2)
+        self.assertEqual(stats['title-list']['queries'], 3)
+        self.assertEqual(stats['review-detail']['requests'], 1)
+        self.assertGreater(stats['title-list']['total_ms'], stats['title-list']['db_ms'])
+
+    def test_reset_stats(self):
+        self.not_auth_client.get(reverse('title-list'))
+        response = self.admin_client.delete(self.metrics_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.admin_client.get(self.metrics_url)
+        self.assertEqual([item['route'] for item in response.data], ['request-metrics'])
+
+    def test_stats_of_processes_sharing_cache(self):
+        other = MetricsRegistry()
+        for process, route in [(registry, 'title-list'), (other, 'title-detail')]:
+            process.add(route, 0.01, RequestMetrics())
+            process.flush()
+        self.assertEqual({item['route'] for item in registry.stats()}, {'title-list', 'title-detail'})
+
+        registry.reset()
+        other.add('title-detail', 0.01, RequestMetrics())
+        other.flush()
+        self.assertEqual([(item['route'], item['requests']) for item in registry.stats()], [('title-detail', 1)])
+
+    def test_stats_by_not_admin(self):
+        for client in [self.user_client, self.moderator_client, self.not_auth_client]:
+            response = client.get(self.metrics_url)
+            self.assertIn(response.status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
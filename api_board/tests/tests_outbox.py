@@ -0,0 +1,76 @@
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.mail import EmailMessage, get_connection
+from django.core.management import call_command
+from django.db import connection as db_connection
+from django.test import TestCase
+from django.utils import timezone
+
+from api_board.models import OutgoingEmail
+from api_board.outbox import MAX_ATTEMPTS, RETRY_DELAY, queue_email, send_queued_emails
+
+
+class TestOutbox(TestCase):
+    def queue_emails(self, count):
+        for i in range(count):
+            queue_email(subject='Subject %d' % i, message='Message %d' % i, recipient='user%d@mail.ru' % i)
+
+    def test_send_by_batches_over_one_connection(self):
+        self.queue_emails(5)
+        connection = get_connection()
+        self.assertEqual(send_queued_emails(batch_size=2, connection=connection), (5, 0))
+
+        self.assertEqual([email.to for email in mail.outbox], [['user%d@mail.ru' % i] for i in range(5)])
+        self.assertTrue(all(email.connection is connection for email in mail.outbox))
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    def test_failed_email_is_kept_for_retry(self):
+        self.queue_emails(2)
+        with mock.patch.object(EmailMessage, 'send', side_effect=[ConnectionError('Down'), 1]):
+            self.assertEqual(send_queued_emails(), (1, 1))
+
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.recipient, 'user0@mail.ru')
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('Down', email.last_error)
+
+        # Email waits for its next attempt
+        call_command('send_queued_email', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        call_command('send_queued_email', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    def test_retry_delay_is_doubled(self):
+        self.queue_emails(1)
+        delays = []
+        with mock.patch.object(EmailMessage, 'send', side_effect=ConnectionError('Down')):
+            for _ in range(3):
+                OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+                started = timezone.now()
+                self.assertEqual(send_queued_emails(), (0, 1))
+                delays.append(OutgoingEmail.objects.get().next_attempt_at - started)
+        for delay, expected in zip(delays, [RETRY_DELAY, 2 * RETRY_DELAY, 4 * RETRY_DELAY]):
+            self.assertAlmostEqual(delay.total_seconds(), expected.total_seconds(), delta=1)
+
+    def test_emails_are_sent_outside_of_transaction(self):
+        self.queue_emails(2)
+        depth = len(db_connection.savepoint_ids)
+        depths = []
+
+        def send():
+            depths.append(len(db_connection.savepoint_ids))
+            return 1
+        with mock.patch.object(EmailMessage, 'send', side_effect=send):
+            self.assertEqual(send_queued_emails(), (2, 0))
+        self.assertEqual(depths, [depth, depth])
+
+    def test_email_is_not_sent_after_max_attempts(self):
+        self.queue_emails(1)
+        OutgoingEmail.objects.update(attempts=MAX_ATTEMPTS)
+        self.assertEqual(send_queued_emails(), (0, 0))
+        self.assertEqual(len(mail.outbox), 0)
@@ -0,0 +1,54 @@
+import re
+import unittest
+from pathlib import Path
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Plan format of SQLite is checked')
+@override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
+class TestQueryPlan(TestCase):
+    """Every query of the main list endpoints must be served by an index, not by a full scan."""
+    fixtures = ['reviews', 'titles', 'categories', 'users', 'genres', 'comments']
+    full_scan = re.compile(r'^SCAN ')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.not_auth_client = APIClient()
+        super().setUpTestData()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def check_no_full_scan(self, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.not_auth_client.get(url, data=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for query in context.captured_queries:
+            for step in self.explain(query['sql']):
+                self.assertIsNone(self.full_scan.match(step), msg='%s\n%s' % (query['sql'], step))
+
+    def test_title_list_filter_by_year(self):
+        self.check_no_full_scan(reverse('title-list'), {'year': 1990})
+
+    def test_title_list_filter_by_category(self):
+        self.check_no_full_scan(reverse('title-list'), {'category': 'film'})
+
+    def test_title_list_filter_by_genre(self):
+        self.check_no_full_scan(reverse('title-list'), {'genre': 'comedy'})
+
+    def test_review_list(self):
+        self.check_no_full_scan(reverse('review-list', kwargs={'title_id': 1}))
+
+    def test_review_list_cursor_pagination(self):
+        self.check_no_full_scan(reverse('review-list', kwargs={'title_id': 1}), {'pagination': 'cursor'})
+
+    def test_comment_list(self):
+        self.check_no_full_scan(reverse('comment-list', kwargs={'title_id': 1, 'review_id': 1}))
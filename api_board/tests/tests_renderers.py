@@ -0,0 +1,68 @@
+import datetime
+from collections import OrderedDict
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.reverse import reverse
+from rest_framework.views import APIView
+
+from api_board.renderers import FragmentJSONRenderer, JSONFragment
+from api_board.tests.common import create_clients_for_users
+
+
+class TestFragmentJSONRenderer(TestCase):
+    def assertSameOutput(self, data):
+        self.assertEqual(FragmentJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_output_of_values(self):
+        fragment = JSONFragment([('name', 'Comedy'), ('slug', 'comedy')])
+        data = OrderedDict([
+            ('int', 1), ('float', 1.5), ('bool', True), ('none', None), ('decimal', Decimal('9.50')),
+            ('date', datetime.date(2021, 1, 2)), ('text', 'Ёлка "tree"\n '), ('error', ErrorDetail('Bad')),
+            ('empty_list', []), ('empty_dict', {}), ('tuple', (1, 2)), ('int_keys', {1: 'one'}),
+            ('fragments', [fragment, fragment, JSONFragment()]),
+        ])
+        self.assertSameOutput(data)
+        self.assertSameOutput([data, data])
+        self.assertSameOutput('text')
+
+    def test_output_of_ascii_setting(self):
+        data = {'text': 'Ёлка', 'fragment': JSONFragment(text='Ёлка')}
+        with mock.patch.object(FragmentJSONRenderer, 'ensure_ascii', True), \
+                mock.patch.object(JSONRenderer, 'ensure_ascii', True):
+            self.assertSameOutput(data)
+
+    def test_indented_output(self):
+        data = {'fragment': JSONFragment(name='Comedy')}
+        self.assertEqual(FragmentJSONRenderer().render(data, 'application/json; indent=4'),
+                         JSONRenderer().render(data, 'application/json; indent=4'))
+
+
+@override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
+class TestFragmentJSONRendererResponses(TestCase):
+    fixtures = ['genres', 'categories', 'titles', 'users', 'reviews', 'comments']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_client, _, _ = create_clients_for_users()
+        super().setUpTestData()
+
+    def test_output_of_responses(self):
+        urls = [
+            reverse('title-list'),
+            reverse('title-detail', kwargs={'pk': 1}),
+            reverse('review-list', kwargs={'title_id': 1}),
+            reverse('comment-list', kwargs={'title_id': 1, 'review_id': 1}),
+            reverse('category-list'),
+            reverse('user-me'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.user_client.get(url)
+                with mock.patch.object(APIView, 'renderer_classes', [JSONRenderer]):
+                    expected = self.user_client.get(url)
+                self.assertEqual(response.content, expected.content)
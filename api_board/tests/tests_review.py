@@ -1,11 +1,19 @@
+from decimal import Decimal
+from io import StringIO
 from pathlib import Path
+from unittest import mock
 
+from django.core.management import call_command
+from django.db import IntegrityError, connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 
 from api_board.models import Review, Title
+from api_board.pagination import PageNumberOrCursorPagination
+from api_board.views import ReviewViewSet
 from api_board.tests.common import (
     create_clients_for_users,
     get_user_from_client,
@@ -25,6 +33,7 @@ class TestReview(TestCase):
 
     @classmethod
     def setUpTestData(cls):
+        call_command('rebuild_ratings', stdout=StringIO())
         cls.user_client, cls.moderator_client, cls.admin_client = create_clients_for_users()
         cls.not_auth_client = APIClient()
         super().setUpTestData()
@@ -35,12 +44,56 @@ class TestReview(TestCase):
         self.assertIn('results', response.data)
         self.assertIn('next', response.data)
 
+    def test_review_list_count_from_counter(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.not_auth_client.get(self.list_url)
+        self.assertEqual(response.data['count'], 2)
+        self.assertFalse([query for query in queries.captured_queries if 'COUNT(' in query['sql']])
+
+        response = self.user_client.post(self.list_url, data=self.data)
+        title_url = reverse('title-detail', kwargs={'pk': self.title_id})
+        self.assertEqual(self.not_auth_client.get(self.list_url).data['count'], 3)
+        self.assertEqual(self.not_auth_client.get(title_url).data['reviews_count'], 3)
+
+        url = reverse('review-detail', kwargs={'title_id': self.title_id, 'pk': response.data['id']})
+        self.user_client.delete(url)
+        self.assertEqual(self.not_auth_client.get(self.list_url).data['count'], 2)
+        self.assertEqual(self.not_auth_client.get(title_url).data['reviews_count'], 2)
+
+    @mock.patch.object(PageNumberOrCursorPagination, 'page_size', 1)
+    def test_review_list_cursor_pagination(self):
+        response = self.user_client.get(self.list_url, data={'pagination': 'cursor'})
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        first_page = [review['id'] for review in response.data['results']]
+
+        response = self.user_client.get(response.data['next'])
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+        second_page = [review['id'] for review in response.data['results']]
+
+        reviews = Review.objects.filter(title=self.title_id).order_by('pub_date', 'id')
+        self.assertEqual(first_page + second_page, list(reviews.values_list('id', flat=True)))
+
     def test_review_list_response_data(self):
         response = self.user_client.get(self.list_url)
         data = response.json()['results'][0]
         review = Review.objects.get(id=data['id'])
         self.check_response_data(data, review)
 
+    def test_review_list_fast_path_output(self):
+        for params in [{}, {'pagination': 'cursor'}]:
+            with self.subTest(params=params):
+                response = self.user_client.get(self.list_url, data=params)
+                with mock.patch.object(ReviewViewSet, 'fast_list_serializer', None):
+                    expected = self.user_client.get(self.list_url, data=params)
+                self.assertEqual(response.content, expected.content)
+
+    def test_review_list_sparse_fields(self):
+        response = self.user_client.get(self.list_url, data={'fields': 'id,score'})
+        review = Review.objects.get(id=response.data['results'][0]['id'])
+        self.assertEqual(response.data['results'][0], {'id': review.id, 'score': review.score})
+
     def check_response_data(self, data, review):
         self.assertEqual(data['id'], review.id)
         self.assertEqual(data['author'], review.author.username)
@@ -69,6 +122,15 @@ class TestReview(TestCase):
         self.user_client.post(self.list_url, data=self.data)
         response = self.user_client.post(self.list_url, data={'text': 'Some other', 'score': 6})
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('non_field_errors', response.data)
+        author = get_user_from_client(self.user_client)
+        self.assertEqual(Review.objects.filter(author=author, title=self.title_id).count(), 1)
+
+    def test_create_review_other_integrity_error(self):
+        error = IntegrityError('FOREIGN KEY constraint failed')
+        with mock.patch('rest_framework.serializers.ModelSerializer.create', side_effect=error):
+            with self.assertRaises(IntegrityError):
+                self.user_client.post(self.list_url, data=self.data)
 
     def test_create_review_field_score_validators(self):
         response = self.user_client.post(self.list_url, data={'text': 'Some text', 'score': 11})
@@ -157,6 +219,66 @@ class TestReviewUpdateDelete(TestCase):
         response = self.admin_client.delete(self.detail_url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
+    def test_bulk_update_reviews_by_moderator(self):
+        self.admin_client.post(reverse('review-list', kwargs={'title_id': self.title_id}),
+                               data={'text': 'Admin text', 'score': 7})
+        review_ids = list(Review.objects.order_by('id').values_list('id', flat=True))
+        data = [{'id': review_ids[0], 'score': 1}, {'id': review_ids[1], 'score': 3}]
+        url = reverse('review-bulk', kwargs={'title_id': self.title_id})
+        response = self.moderator_client.patch(url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        title = Title.objects.get(id=self.title_id)
+        self.assertEqual((title.score_sum, title.reviews_count), (4, 2))
+
+    def test_bulk_update_reviews_by_user_not_author(self):
+        client = create_client_for_user()
+        url = reverse('review-bulk', kwargs={'title_id': self.title_id})
+        response = client.patch(url, data=[{'id': self.review_id, 'score': 1}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_create_reviews_not_allowed(self):
+        url = reverse('review-bulk', kwargs={'title_id': 2})
+        response = self.admin_client.post(url, data=[{'text': 'Some text', 'score': 4}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertFalse(Review.objects.filter(title=2).exists())
+
+    def test_title_rating_follows_review_writes(self):
+        title = Title.objects.get(id=self.title_id)
+        self.assertEqual((title.score_sum, title.reviews_count, title.rating), (5, 1, Decimal('5.00')))
+
+        self.moderator_client.post(reverse('review-list', kwargs={'title_id': self.title_id}),
+                                   data={'text': 'Other text', 'score': 8})
+        title.refresh_from_db()
+        self.assertEqual((title.score_sum, title.reviews_count, title.rating), (13, 2, Decimal('6.50')))
+
+        self.user_client.patch(self.detail_url, data={'score': 2})
+        title.refresh_from_db()
+        self.assertEqual((title.score_sum, title.reviews_count, title.rating), (10, 2, Decimal('5.00')))
+
+        self.user_client.delete(self.detail_url)
+        title.refresh_from_db()
+        self.assertEqual((title.score_sum, title.reviews_count, title.rating), (8, 1, Decimal('8.00')))
+
+    def test_update_review_loaded_before_concurrent_update(self):
+        stale = Review.objects.get(id=self.review_id)
+        self.user_client.patch(self.detail_url, data={'score': 2})
+        with mock.patch.object(ReviewViewSet, 'get_object', return_value=stale):
+            response = self.user_client.patch(self.detail_url, data={'score': 9})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        title = Title.objects.get(id=self.title_id)
+        self.assertEqual((title.score_sum, title.reviews_count, title.rating), (9, 1, Decimal('9.00')))
+
+    def test_get_review_not_modified(self):
+        response = self.not_auth_client.get(self.detail_url)
+        etag = response['ETag']
+        response = self.not_auth_client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.user_client.patch(self.detail_url, data=self.data)
+        response = self.not_auth_client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['text'], self.data['text'])
+
     def test_delete_review_by_user_not_author(self):
         client = create_client_for_user()
         response = client.delete(self.detail_url)
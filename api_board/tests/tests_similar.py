@@ -0,0 +1,82 @@
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipIf
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api_board import similar
+from api_board.models import Review, SimilarTitle, SimilarTitleStaging, Title
+from api_board.similar import stage_similar_titles
+
+
+@override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
+class TestSimilarTitles(TestCase):
+    fixtures = ['genres', 'categories', 'titles', 'users', 'reviews']
+
+    @classmethod
+    def setUpTestData(cls):
+        # Titles 1 and 3 are liked by the same users, title 2 is disliked by them
+        Review.objects.bulk_create([
+            Review(author_id=author_id, title_id=title_id, score=score, text='Review')
+            for author_id, title_id, score in [(4, 3, 10), (4, 2, 2), (2, 3, 9), (2, 2, 3),
+                                               (3, 1, 8), (3, 3, 9), (3, 2, 1)]
+        ])
+        call_command('rebuild_ratings', stdout=StringIO())
+        cls.not_auth_client = APIClient()
+        super().setUpTestData()
+
+    def build(self, **options):
+        call_command('build_similar_titles', stdout=StringIO(), **options)
+        return list(SimilarTitle.objects.order_by('title_id', '-score').values_list('title_id', 'similar_id', 'score'))
+
+    def test_similar_titles(self):
+        index = self.build(pure_python=True)
+        self.assertEqual([(title_id, similar_id) for title_id, similar_id, _ in index], [(1, 3), (3, 1)])
+        self.assertAlmostEqual(index[0][2], index[1][2])
+
+        url = reverse('title-similar', kwargs={'pk': 1})
+        with self.assertNumQueries(1):
+            response = self.not_auth_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(item['id'], item['name']) for item in response.data],
+                         [(3, 'Home Alone 2: Lost in New York')])
+        self.assertGreater(response.data[0]['score'], 0)
+
+        response = self.not_auth_client.get(reverse('title-similar', kwargs={'pk': 2}))
+        self.assertEqual(response.data, [])
+        response = self.not_auth_client.get(reverse('title-similar', kwargs={'pk': 100}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.not_auth_client.get(reverse('title-similar', kwargs={'pk': 'abc'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_neighbors_and_shrinkage(self):
+        self.assertEqual(len(self.build(pure_python=True, neighbors=1, shrinkage=0)), 2)
+        score = self.build(pure_python=True, shrinkage=0)[0][2]
+        self.assertAlmostEqual(self.build(pure_python=True, shrinkage=3)[0][2], score * 3 / (3 + 3))
+
+    def test_index_is_staged_by_batches(self):
+        expected = self.build(pure_python=True)
+        with mock.patch.object(similar, 'INSERT_BATCH_SIZE', 1):
+            self.assertEqual(self.build(pure_python=True), expected)
+        self.assertFalse(SimilarTitleStaging.objects.exists())
+
+    def test_titles_deleted_during_build_are_skipped(self):
+        def stage_and_delete(neighbors_of_titles):
+            count = stage_similar_titles(neighbors_of_titles)
+            Title.objects.filter(id=3).delete()
+            return count
+        with mock.patch.object(similar, 'stage_similar_titles', side_effect=stage_and_delete):
+            self.assertEqual(self.build(pure_python=True), [])
+
+    @skipIf(similar.np is None, 'NumPy and SciPy are not installed')
+    def test_vectorized_build_is_the_same(self):
+        expected = self.build(pure_python=True)
+        for chunk_size in (1, 1000):
+            index = self.build(chunk_size=chunk_size)
+            self.assertEqual([row[:2] for row in index], [row[:2] for row in expected])
+            for row, expected_row in zip(index, expected):
+                self.assertAlmostEqual(row[2], expected_row[2])
@@ -0,0 +1,117 @@
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api_board.models import Title, TitleStats
+from api_board.stats import rebuild_title_stats, track_title_stats
+from api_board.tests.common import create_clients_for_users
+
+
+@override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
+class TestTitleStats(TestCase):
+    fixtures = ['genres', 'categories', 'titles', 'users', 'reviews']
+    url = reverse('title-stats')
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('rebuild_ratings', stdout=StringIO())
+        call_command('rebuild_stats', stdout=StringIO())
+        cls.user_client, cls.moderator_client, cls.admin_client = create_clients_for_users()
+        cls.not_auth_client = APIClient()
+        super().setUpTestData()
+
+    def get_stats(self, **params):
+        response = self.not_auth_client.get(self.url, data=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [dict(row) for row in response.data['results']]
+
+    def assertStatsRebuilt(self):
+        """Stats maintained by writes are the same as the rebuilt ones."""
+        maintained = set(TitleStats.objects.filter(titles_count__gt=0).values_list(
+            'category_id', 'genre_id', 'year', 'titles_count', 'reviews_count', 'score_sum'))
+        rebuild_title_stats()
+        rebuilt = set(TitleStats.objects.values_list(
+            'category_id', 'genre_id', 'year', 'titles_count', 'reviews_count', 'score_sum'))
+        self.assertEqual(maintained, rebuilt)
+
+    def test_totals(self):
+        # count and page of summary rows, titles aren't read
+        with self.assertNumQueries(2):
+            response = self.not_auth_client.get(self.url)
+        self.assertEqual(response.data['results'], [
+            {'category': None, 'genre': None, 'year': None, 'titles_count': 3, 'reviews_count': 2, 'rating': '9.50'},
+        ])
+
+    def test_group_by(self):
+        self.assertEqual(self.get_stats(group_by='category'), [
+            {'category': 'film', 'genre': None, 'year': None, 'titles_count': 2, 'reviews_count': 2, 'rating': '9.50'},
+            {'category': 'book', 'genre': None, 'year': None, 'titles_count': 1, 'reviews_count': 0, 'rating': None},
+        ])
+        rows = self.get_stats(category='film', group_by='genre')
+        self.assertEqual([(row['genre'], row['titles_count']) for row in rows], [('comedy', 2), ('family', 2)])
+        rows = self.get_stats(genre='comedy', group_by='year')
+        self.assertEqual([(row['year'], row['titles_count'], row['rating']) for row in rows],
+                         [(1990, 1, '9.50'), (1992, 1, None)])
+        self.assertEqual(self.get_stats(category='book', genre='comedy'), [])
+        self.assertEqual(len(self.get_stats(group_by='category,genre,year')), 5)
+
+    def test_invalid_params(self):
+        response = self.not_auth_client.get(self.url, data={'group_by': 'author'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('group_by', response.data)
+
+    def test_stats_follow_review_writes(self):
+        list_url = reverse('review-list', kwargs={'title_id': 3})
+        response = self.user_client.post(list_url, data={'text': 'Good', 'score': 4})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        detail_url = reverse('review-detail', kwargs={'title_id': 3, 'pk': response.data['id']})
+        self.user_client.patch(detail_url, data={'score': 6})
+        self.assertEqual(self.get_stats(year=1992)[0]['rating'], '6.00')
+        self.assertStatsRebuilt()
+
+        self.admin_client.delete(reverse('review-detail', kwargs={'title_id': 1, 'pk': 1}))
+        self.assertEqual(self.get_stats(category='film')[0]['reviews_count'], 2)
+        self.assertStatsRebuilt()
+
+    def test_stats_follow_title_writes(self):
+        response = self.admin_client.post(reverse('title-list'), data={
+            'name': 'Home alone 3', 'year': 1997, 'category': 'film', 'genre': ['comedy', 'family'],
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.get_stats(genre='family')[0]['titles_count'], 3)
+        self.assertStatsRebuilt()
+
+        # Title with reviews moves to another category, genre and year
+        url = reverse('title-detail', kwargs={'pk': 1})
+        response = self.admin_client.patch(url, data={'category': 'book', 'genre': ['historical'], 'year': 1991})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_stats(category='book')[0]['reviews_count'], 2)
+        self.assertStatsRebuilt()
+
+        self.admin_client.delete(url)
+        self.assertEqual(self.get_stats()[0]['titles_count'], 3)
+        self.assertStatsRebuilt()
+
+    def test_tracked_titles_are_locked(self):
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True,
+                               side_effect=lambda queryset, **kwargs: queryset) as lock:
+            with track_title_stats(id=1):
+                self.assertEqual([call.args[0].model for call in lock.call_args_list], [Title])
+
+    def test_stats_follow_category_and_genre_deletion(self):
+        self.admin_client.delete(reverse('genre-detail', kwargs={'slug': 'comedy'}))
+        self.assertEqual(self.get_stats(genre='comedy'), [])
+        self.assertStatsRebuilt()
+
+        self.admin_client.delete(reverse('category-detail', kwargs={'slug': 'film'}))
+        self.assertEqual(Title.objects.count(), 1)
+        self.assertEqual(self.get_stats()[0]['titles_count'], 1)
+        self.assertFalse(TitleStats.objects.filter(category_id=1).exists())
+        self.assertStatsRebuilt()
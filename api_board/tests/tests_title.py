@@ -1,7 +1,11 @@
+import json
 from decimal import Decimal
+from io import StringIO
 from pathlib import Path
+from unittest import mock
 
 from django.core import exceptions
+from django.core.management import call_command
 from django.test import TestCase, override_settings
 from rest_framework import status
 from rest_framework.renderers import JSONRenderer
@@ -11,6 +15,7 @@ from rest_framework.test import APIClient
 from api_board.models import Title, Category, Genre
 from api_board.serializers import GenreSerializer
 from api_board.tests.common import create_clients_for_users
+from api_board.views import TitleViewSet
 
 
 @override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
@@ -19,6 +24,7 @@ class TestTitle(TestCase):
 
     @classmethod
     def setUpTestData(cls):
+        call_command('rebuild_ratings', stdout=StringIO())
         cls.user_client, cls.moderator_client, cls.admin_client = create_clients_for_users()
         cls.not_auth_client = APIClient()
 
@@ -49,11 +55,84 @@ class TestTitle(TestCase):
         self.assertIn('results', response.data)
         self.assertIn('next', response.data)
 
+    def test_title_list_cursor_pagination(self):
+        response = self.not_auth_client.get(self.list_url, data={'pagination': 'cursor'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertIn('next', response.data)
+        ids = [title['id'] for title in response.data['results']]
+        self.assertEqual(ids, list(Title.objects.order_by('id').values_list('id', flat=True)))
+
     def test_title_list_response_data(self):
         response = self.not_auth_client.get(self.list_url)
         data = response.json()['results'][0]
         self.check_response_data(data)
 
+    def test_title_list_number_of_queries(self):
+        # validators with count, titles with categories, genres of the page
+        with self.assertNumQueries(3):
+            self.not_auth_client.get(self.list_url)
+
+    def test_title_list_fast_path_output(self):
+        for params in [{}, {'pagination': 'cursor'}, {'q': 'home'}, {'genre': 'comedy'}]:
+            with self.subTest(params=params):
+                response = self.not_auth_client.get(self.list_url, data=params)
+                with mock.patch.object(TitleViewSet, 'fast_list_serializer', None):
+                    expected = self.not_auth_client.get(self.list_url, data=params)
+                self.assertEqual(response.content, expected.content)
+
+    def test_get_title_number_of_queries(self):
+        # validators, title with category, genres of the title
+        with self.assertNumQueries(3):
+            self.not_auth_client.get(self.detail_url)
+
+    def test_get_title_invalid_id(self):
+        response = self.not_auth_client.get(reverse('title-detail', kwargs={'pk': 'abc'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.not_auth_client.get(reverse('review-detail', kwargs={'title_id': self.pk, 'pk': 'abc'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_title_not_modified(self):
+        response = self.not_auth_client.get(self.detail_url)
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.not_auth_client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.admin_client.patch(self.detail_url, data=self.new_data)
+        response = self.not_auth_client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_title_list_not_modified(self):
+        response = self.not_auth_client.get(self.list_url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/'))
+
+        response = self.not_auth_client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.not_auth_client.get(self.list_url, data={'year': 1990}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_title_list_sparse_fields(self):
+        # validators with count, titles without categories and genres
+        with self.assertNumQueries(2):
+            response = self.not_auth_client.get(self.list_url, data={'fields': 'id,name,rating'})
+        self.assertEqual(list(response.data['results'][0]), ['id', 'name', 'rating'])
+
+    def test_get_title_expand(self):
+        response = self.not_auth_client.get(self.detail_url, data={'expand': 'genre'})
+        title = Title.objects.get(id=self.pk)
+        self.assertEqual(response.data['category'], title.category.slug)
+        self.assertEqual(response.data['genre'][0]['slug'], title.genre.first().slug)
+
+        response = self.not_auth_client.get(self.detail_url, data={'fields': 'id,genre', 'expand': ''})
+        self.assertEqual(response.data, {'id': self.pk, 'genre': list(title.genre.values_list('slug', flat=True))})
+
     def test_title_list_filter_by_name(self):
         param = 'home'
         url = self.list_url + '?name=%s' % param
@@ -61,6 +140,26 @@ class TestTitle(TestCase):
         titles = Title.objects.filter(name__icontains=param)
         self.assertEqual(response.data['count'], titles.count())
 
+    def test_title_list_full_text_search(self):
+        response = self.not_auth_client.get(self.list_url, data={'q': 'tolstoy'})
+        self.assertEqual([title['id'] for title in response.data['results']], [2])
+
+        response = self.not_auth_client.get(self.list_url, data={'q': 'home'})
+        titles = Title.objects.filter(name__icontains='home')
+        self.assertEqual(response.data['count'], titles.count())
+
+        response = self.not_auth_client.get(self.list_url, data={'q': '"(*'})
+        self.assertEqual(response.data['count'], 0)
+
+    def test_title_full_text_search_follows_changes(self):
+        self.admin_client.patch(self.detail_url, data={'name': 'Completely different'})
+        response = self.not_auth_client.get(self.list_url, data={'q': 'complet'})
+        self.assertEqual([title['id'] for title in response.data['results']], [self.pk])
+
+        self.admin_client.delete(self.detail_url)
+        response = self.not_auth_client.get(self.list_url, data={'q': 'complet'})
+        self.assertEqual(response.data['count'], 0)
+
     def test_title_list_filter_by_year(self):
         param = 1990
         url = self.list_url + '?year=%s' % param
@@ -170,6 +269,95 @@ class TestTitle(TestCase):
         with self.assertRaises(exceptions.ObjectDoesNotExist):
             Title.objects.get(id=self.pk)
 
+    def test_rebuild_ratings_command(self):
+        Title.objects.update(score_sum=0, reviews_count=0, rating=None)
+        call_command('rebuild_ratings', stdout=StringIO())
+        title = Title.objects.get(id=self.pk)
+        self.assertEqual(title.score_sum, sum(title.reviews.values_list('score', flat=True)))
+        self.assertEqual(title.reviews_count, title.reviews.count())
+        response = self.not_auth_client.get(self.detail_url)
+        self.check_response_data(response.data)
+
+    def test_title_with_top_rating(self):
+        Title.objects.filter(id=self.pk).update(rating=Decimal('10.00'))
+        response = self.not_auth_client.get(self.detail_url)
+        self.assertEqual(response.data['rating'], '10.00')
+        response = self.not_auth_client.get(self.list_url)
+        self.assertEqual(response.data['results'][0]['rating'], '10.00')
+
+    def test_update_title_keeps_concurrent_rating(self):
+        stale = Title.objects.get(id=1)
+        self.user_client.post(reverse('review-list', kwargs={'title_id': 1}), data={'text': 'Review', 'score': 8})
+        with mock.patch.object(TitleViewSet, 'get_object', return_value=stale):
+            response = self.admin_client.patch(self.detail_url, data={'name': 'Renamed'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        title = Title.objects.get(id=1)
+        self.assertEqual((title.name, title.score_sum, title.reviews_count, title.rating),
+                         ('Renamed', 27, 3, Decimal('9.00')))
+
+    def test_bulk_create_titles(self):
+        other = dict(self.data, name='Home alone 4', year=2002)
+        response = self.admin_client.post(reverse('title-bulk'), data=[self.data, other], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([title['name'] for title in response.data], [self.data['name'], other['name']])
+        self.assertEqual(Title.objects.filter(name__in=[self.data['name'], other['name']]).count(), 2)
+
+    def test_bulk_create_titles_errors_per_item(self):
+        count = Title.objects.count()
+        invalid = dict(self.data, category='unknown')
+        response = self.admin_client.post(reverse('title-bulk'), data=[self.data, invalid], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('category', response.data[1])
+        self.assertEqual(Title.objects.count(), count)
+
+    def test_bulk_create_titles_by_user(self):
+        response = self.user_client.post(reverse('title-bulk'), data=[self.data], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_update_titles(self):
+        data = [{'id': 1, 'name': 'First'}, {'id': 2, 'year': 1870}]
+        response = self.admin_client.patch(reverse('title-bulk'), data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Title.objects.get(id=1).name, 'First')
+        self.assertEqual(Title.objects.get(id=2).year, 1870)
+
+    def test_bulk_update_titles_errors_per_item(self):
+        data = [{'id': 1, 'name': 'First'}, {'id': 181, 'name': 'Missing'}, {'id': 2, 'genre': ['unknown']}]
+        response = self.admin_client.patch(reverse('title-bulk'), data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('id', response.data[1])
+        self.assertIn('genre', response.data[2])
+        self.assertNotEqual(Title.objects.get(id=1).name, 'First')
+
+    def test_export_titles_by_admin(self):
+        response = self.admin_client.get(reverse('title-export'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), Title.objects.count())
+        record = json.loads(lines[0])
+        title = Title.objects.get(id=record['id'])
+        self.assertEqual(record['category'], title.category.slug)
+        self.assertEqual(record['genre'], list(title.genre.values_list('slug', flat=True)))
+        self.assertEqual(record['rating'], str(title.rating))
+
+        response = self.admin_client.get(reverse('title-export'), data={'output': 'csv'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,name,year,description,rating,category,genre')
+        self.assertEqual(len(lines), Title.objects.count() + 1)
+
+    def test_export_titles_by_user(self):
+        response = self.user_client.get(reverse('title-export'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_titles_command(self):
+        out = StringIO()
+        call_command('export_titles', chunk_size=1, stdout=out)
+        ids = [json.loads(line)['id'] for line in out.getvalue().splitlines()]
+        self.assertEqual(ids, list(Title.objects.order_by('id').values_list('id', flat=True)))
+
     def check_response_data(self, data):
         title = Title.objects.get(id=data['id'])
         total_score = sum(title.reviews.values_list('score', flat=True))
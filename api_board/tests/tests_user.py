@@ -1,12 +1,15 @@
+from decimal import Decimal
+from io import StringIO
 from pathlib import Path
 
 from django.core import exceptions
+from django.core.management import call_command
 from django.test import TestCase, override_settings
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 
-from api_board.models import User
+from api_board.models import Title, TitleStats, User
 from api_board.tests.common import create_clients_for_users
 
 
@@ -168,3 +171,28 @@ class TestUser(TestCase):
         self.assertEqual(data['email'], user.email)
         self.assertEqual(data['bio'], user.bio)
         self.assertEqual(data['role'], user.role)
+
+
+@override_settings(FIXTURE_DIRS=[Path(__file__).resolve().parent/'fixtures', ])
+class TestUserDeletion(TestCase):
+    fixtures = ['genres', 'categories', 'titles', 'users', 'reviews', 'comments']
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('rebuild_ratings', stdout=StringIO())
+        call_command('rebuild_stats', stdout=StringIO())
+        cls.user_client, cls.moderator_client, cls.admin_client = create_clients_for_users()
+        super().setUpTestData()
+
+    def test_counters_follow_deletion_of_author(self):
+        # Moderator is the author of review 2 and comment 2 on review 1 of other user
+        response = self.admin_client.delete(reverse('user-detail', kwargs={'username': 'moderator'}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.client.get(reverse('review-list', kwargs={'title_id': 1}))
+        self.assertEqual((response.data['count'], len(response.data['results'])), (1, 1))
+        response = self.client.get(reverse('comment-list', kwargs={'title_id': 1, 'review_id': 1}))
+        self.assertEqual((response.data['count'], len(response.data['results'])), (1, 1))
+        title = Title.objects.get(id=1)
+        self.assertEqual((title.score_sum, title.reviews_count, title.rating), (9, 1, Decimal('9.00')))
+        self.assertEqual(TitleStats.objects.get(category_id=0, genre_id=0, year=0).reviews_count, 1)
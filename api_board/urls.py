@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.urls import path, include
 from . import views
+from .async_views import offload_routes
 from rest_framework.routers import SimpleRouter
 
 route = SimpleRouter()
@@ -14,5 +16,6 @@ route.register(r'titles/(?P<title_id>[^/.]+)/reviews/(?P<review_id>[^/.]+)/comme
 urlpatterns = [
     path('auth/email/', views.get_confirmation_code, name='get-confirmation_code'),
     path('auth/token/', views.get_token, name='get-token'),
-    path('', include(route.urls))
+    path('metrics/', views.request_metrics, name='request-metrics'),
+    path('', include(offload_routes(route.urls) if settings.ASYNC_READ_VIEWS else route.urls))
 ]
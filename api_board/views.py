@@ -1,22 +1,33 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
-from django.db.models import Avg
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.http import FileResponse, Http404
 from django.utils.timezone import now
 from django_filters import rest_framework as filters
 from rest_framework import viewsets, status, permissions
-from rest_framework.decorators import api_view, action
+from rest_framework.decorators import api_view, action, permission_classes
 from rest_framework.exceptions import ValidationError
 from rest_framework.filters import SearchFilter
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 
 from api_board.serializers import CreateUserSerializer, UserSerializer, CategorySerializer, GenreSerializer, \
-    TitleSerializerGet, ReviewSerializer, CommentSerializer, TitleSerializerPost
+    TitleSerializerGet, ReviewSerializer, CommentSerializer, TitleSerializerPost, ValuesSerializer, \
+    TitleStatsSerializer, TitleStatsQuerySerializer, LeaderboardEntrySerializer, LeaderboardQuerySerializer, \
+    SimilarTitleSerializer
+from .authentication import ClaimsRefreshToken
+from .export import RENDERERS, export_titles
 from .filters import TitleFilter
-from .functions import generate_username
-from .mixins import ReviewCommentMixin, CategoryGenreMixin
-from .models import Category, Genre, Title, Review, Comment
+from .functions import update_review_comments_count, update_title_rating
+from .leaderboards import get_leaderboard, update_title_entries
+from .metrics import registry as metrics_registry
+from .mixins import ReviewCommentMixin, CategoryGenreMixin, ConditionalGetMixin, BulkWriteMixin, \
+    SparseFieldsetMixin, FastListMixin
+from .models import Category, Genre, Title, Review, Comment, TitleStats, LeaderboardEntry, SimilarTitle
+from .outbox import queue_email
 from .permissions import IsAdminRole
+from .stats import add_review_stats, add_title_stats, get_title_stats, track_title_stats
 
 User = get_user_model()
 
@@ -30,6 +41,22 @@ class UserViewSet(viewsets.ModelViewSet):
     search_fields = ['username']
     http_method_names = ['get', 'post', 'patch', 'delete']
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        """Reviews and comments of the user are deleted with it, so counters of their titles and reviews go down."""
+        reviews = list(Review.objects.filter(author=instance).order_by().values('title_id')
+                       .annotate(score=Sum('score'), count=Count('id')))
+        # Comments on reviews of the user are deleted with the reviews
+        comments = list(Comment.objects.filter(author=instance).exclude(review__author=instance).order_by()
+                        .values('review_id').annotate(count=Count('id')))
+        instance.delete()
+        for row in reviews:
+            update_title_rating(row['title_id'], -row['score'], -row['count'])
+            add_review_stats(row['title_id'], -row['score'], -row['count'])
+            update_title_entries(row['title_id'])
+        for row in comments:
+            update_review_comments_count(row['review_id'], -row['count'])
+
     @action(detail=False,  permission_classes=[permissions.IsAuthenticated],
             methods=['GET', 'PATCH'], url_path='me', url_name='me')
     def current_user(self, request):
@@ -53,49 +80,192 @@ class CategoryViewSet(CategoryGenreMixin):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # Titles of the category are deleted with it
+        TitleStats.objects.filter(category_id=instance.id).delete()
+        LeaderboardEntry.objects.filter(category_id=instance.id).delete()
+        with track_title_stats(category=instance):
+            super().perform_destroy(instance)
+
 
 class GenreViewSet(CategoryGenreMixin):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # Titles lose the genre, so their representation changes
+        Title.objects.filter(genre=instance).update(modified=now())
+        TitleStats.objects.filter(genre_id=instance.id).delete()
+        LeaderboardEntry.objects.filter(genre_id=instance.id).delete()
+        super().perform_destroy(instance)
 
-class TitleViewSet(viewsets.ModelViewSet):
+
+class TitleViewSet(ConditionalGetMixin, SparseFieldsetMixin, FastListMixin, BulkWriteMixin, viewsets.ModelViewSet):
     filter_backends = [filters.DjangoFilterBackend]
     filterset_class = TitleFilter
+    cursor_ordering = ('id',)
+    fast_list_serializer = ValuesSerializer(TitleSerializerGet)
     http_method_names = ['get', 'post', 'patch', 'delete']
 
-    def get_serializer(self, *args, **kwargs):
+    def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
-            serializer_class = TitleSerializerGet
-        else:
-            serializer_class = TitleSerializerPost
-        return serializer_class(*args, **kwargs)
+            return TitleSerializerGet
+        return TitleSerializerPost
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'stats', 'top', 'similar']:
             permission_classes = [permissions.AllowAny]
         else:
             permission_classes = [IsAdminRole]
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
-        """Added annotation field with average rating."""
-        queryset = Title.objects.all().annotate(rating=Avg('reviews__score')).order_by('id')
-        return queryset
+        """Rating is read from the stored field, which is maintained by ReviewViewSet.
+
+        Category and genres are loaded in bulk, so a page costs the same number of queries whatever its size.
+        """
+        queryset = Title.objects.order_by('id')
+        return self.get_sparse_queryset(queryset, select_related=['category'], prefetch_related=['genre'])
+
+    @action(detail=False, methods=['GET'], url_path='export', url_name='export')
+    def export(self, request):
+        """Export all titles as NDJSON or CSV (?output=csv).
+
+        Titles are written to a temporary file by chunks, which is moved to disk when it grows large,
+        so memory doesn't depend on number of titles. The database is queried before the response is sent,
+        because ASGI server iterates the response on the event loop, where the ORM can't be used.
+        """
+        output = request.query_params.get('output', 'ndjson')
+        if output not in RENDERERS:
+            raise ValidationError({'output': 'Choose one of: %s' % ', '.join(RENDERERS)})
+        _, content_type = RENDERERS[output]
+        file = export_titles(output)
+        size = file.seek(0, 2)
+        file.seek(0)
+        response = FileResponse(file, content_type=content_type, as_attachment=True, filename='titles.%s' % output)
+        response['Content-Length'] = size
+        return response
+
+    @action(detail=False, methods=['GET'], url_path='stats', url_name='stats')
+    def stats(self, request):
+        """Numbers of titles and reviews and average score from the summary table, titles aren't scanned.
+
+        ``category``, ``genre`` and ``year`` params select titles, ``group_by`` lists dimensions
+        with a row per value, e.g. ``?category=film&group_by=year``.
+        """
+        params = TitleStatsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        page = self.paginate_queryset(get_title_stats(**params.validated_data))
+        return self.get_paginated_response(TitleStatsSerializer(page, many=True).data)
+
+    @action(detail=False, methods=['GET'], url_path='top', url_name='top')
+    def top(self, request):
+        """Top titles by rating or by number of reviews (``metric=velocity``) of all time or of the last
+        ``window`` days, optionally of a ``category`` or a ``genre``.
+
+        Titles are read from the maintained leaderboard by index of the board, they aren't sorted per request.
+        """
+        params = LeaderboardQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(LeaderboardEntrySerializer(get_leaderboard(**params.validated_data), many=True).data)
+
+    @action(detail=True, methods=['GET'], url_path='similar', url_name='similar')
+    def similar(self, request, pk=None):
+        """Titles liked by the users, who reviewed this title, from the index of build_similar_titles command.
 
+        Similar titles are read by one query of the index of title, the title is looked up only if it has none.
+        """
+        try:
+            neighbors = list(SimilarTitle.objects.filter(title_id=pk).select_related('similar'))
+        except (TypeError, ValueError):
+            raise Http404
+        if not neighbors:
+            get_object_or_404(Title.objects.only('id'), id=pk)
+        return Response(SimilarTitleSerializer(neighbors, many=True).data)
 
-class ReviewViewSet(ReviewCommentMixin):
+    @transaction.atomic
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        titles = serializer.instance if isinstance(serializer.instance, list) else [serializer.instance]
+        add_title_stats(id__in=[title.id for title in titles])
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        with track_title_stats(id=serializer.instance.id):
+            super().perform_update(serializer)
+        # Title moves to leaderboards of its new category and genres
+        update_title_entries(serializer.instance.id)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        with track_title_stats(id=instance.id):
+            super().perform_destroy(instance)
+
+
+class ReviewViewSet(BulkWriteMixin, ReviewCommentMixin):
     serializer_class = ReviewSerializer
+    fast_list_serializer = ValuesSerializer(ReviewSerializer)
     model = Review
     related_model = Title
     related_field = 'title'
+    counter_field = 'reviews_count'
+    list_select_related = ('author', 'title')
+    etag_fields = ('modified', 'title__modified')
+
+    # Author has one review per title and the title is taken from url, so bulk create would make one review at most
+    bulk_create = None
+
+    @action(detail=False, methods=['PATCH'], url_path='bulk', url_name='bulk')
+    def bulk_update(self, request, *args, **kwargs):
+        return super().bulk_update(request, *args, **kwargs)
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        review = serializer.instance
+        update_title_rating(review.title_id, review.score, 1)
+        add_review_stats(review.title_id, review.score, 1)
+        update_title_entries(review.title_id)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        # Instance is loaded before the transaction, score is read again under lock of the row,
+        # so concurrent updates of the review apply differences against each other's score
+        old_score = Review.objects.select_for_update().values_list('score', flat=True).get(id=serializer.instance.id)
+        review = serializer.save()
+        update_title_rating(review.title_id, review.score - old_score, 0)
+        add_review_stats(review.title_id, review.score - old_score, 0)
+        update_title_entries(review.title_id)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+        update_title_rating(instance.title_id, -instance.score, -1)
+        add_review_stats(instance.title_id, -instance.score, -1)
+        update_title_entries(instance.title_id)
 
 
 class CommentViewSet(ReviewCommentMixin):
     serializer_class = CommentSerializer
+    fast_list_serializer = ValuesSerializer(CommentSerializer)
     model = Comment  # Review
     related_model = Review  # Title
     related_field = 'review'  # 'title'
+    counter_field = 'comments_count'
+    # Review must belong to the title of url
+    related_lookups = {'id': 'review_id', 'title_id': 'title_id'}
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        update_review_comments_count(self.related_object.id, 1)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+        update_review_comments_count(instance.review_id, -1)
 
 
 @api_view(['POST'])
@@ -105,22 +275,19 @@ def get_confirmation_code(request, *args, **kwargs):
         user = User.objects.get(email=email)
         serializer = CreateUserSerializer(instance=user)
     except User.DoesNotExist:
-        username = request.data.get('username')
-        if not username:
-            username = generate_username(User, email)
-        data = {
-            'username': username,
-            'email': email
-        }
+        data = {'email': email}
+        # Username is generated from email by serializer, if it isn't given
+        if request.data.get('username'):
+            data['username'] = request.data.get('username')
         serializer = CreateUserSerializer(data=data)
         if serializer.is_valid(raise_exception=True):
             user = serializer.save()
 
-    # Create confirmation code and send email
+    # Create confirmation code and put email to outbox, send_queued_email worker sends it
     confirmation_code = default_token_generator.make_token(user)  # noqa
-    user.email_user(subject='Activation code',
-                    message='Your confirmation code %s ' % confirmation_code
-                    )
+    queue_email(subject='Activation code',
+                message='Your confirmation code %s ' % confirmation_code,
+                recipient=user.email)
 
     return Response(serializer.data)
 
@@ -140,10 +307,20 @@ def get_token(request, *args, **kwargs):
         # Creating a record about logging, after that confirmation code doesn't works
         user.last_login = now()
         user.save()
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         return Response(data={'token': str(refresh.access_token)},
                         status=status.HTTP_200_OK)
     else:
 
         return Response(data={'confirmation_code': 'Invalid data'},
                         status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminRole])
+def request_metrics(request, *args, **kwargs):
+    """Averages of query count and timings per route name, DELETE resets them."""
+    if request.method == 'DELETE':
+        metrics_registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(metrics_registry.stats())
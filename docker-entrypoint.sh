@@ -0,0 +1,12 @@
+#!/bin/sh
+# Start workers in background, then replace the shell with the command of the container, e.g. the ASGI server.
+# Workers are stopped together with the container.
+set -e
+
+# send emails of outbox, e.g. confirmation codes
+python manage.py send_queued_email --loop &
+
+# refresh sliding windows of leaderboards
+python manage.py refresh_leaderboards --loop &
+
+exec "$@"
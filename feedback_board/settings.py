@@ -33,10 +33,11 @@ INSTALLED_APPS = [
     'django_filters',
 
     # Local
-    'api_board',
+    'api_board.apps.ApiBoardConfig',
 ]
 
 MIDDLEWARE = [
+    'api_board.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,6 +67,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'feedback_board.wsgi.application'
 
+# Serve read-heavy routes by async views, which run DRF views in thread pool.
+# asgi.py turns it on, under WSGI async views would cost an event loop per request.
+ASYNC_READ_VIEWS = os.getenv('DJANGO_ASYNC_READ_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
@@ -78,6 +83,26 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cached pages of category and genre lists are invalidated by a version key in this cache.
+# With LocMemCache other processes of the server don't see the new version, so they keep
+# pages for 10 seconds only; a shared cache (e.g. Memcached or Redis) keeps them for an hour.
+LIST_CACHE = 'default'
+
+# Sums of request metrics per route are added to this cache every interval (seconds),
+# processes of the server should share it to get stats of all of them
+REQUEST_METRICS_CACHE = 'default'
+REQUEST_METRICS_FLUSH_INTERVAL = 10
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -134,15 +159,22 @@ else:
 
 # RestFrameWork settings
 REST_FRAMEWORK = {
-    # Simple Jwt auth
+    # Simple Jwt auth, 'api_board.authentication.StatelessJWTAuthentication' checks permissions
+    # by claims of token without query of user
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',  # noqa
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
 
-    # Pagination
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # JSON renderer, which encodes shared nested objects once, output is the same as of JSONRenderer
+    'DEFAULT_RENDERER_CLASSES': [
+        'api_board.renderers.FragmentJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    # Pagination, page number by default and cursor with ?pagination=cursor
+    'DEFAULT_PAGINATION_CLASS': 'api_board.pagination.PageNumberOrCursorPagination',
     'PAGE_SIZE': 10,
 }
 # Simple JWT Token settings